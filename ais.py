@@ -0,0 +1,223 @@
+from datetime import datetime
+import json
+import numpy as np
+from timeseries import to_datetime64, EARLIEST, LATEST
+import ingest
+
+# Kystdatahuset field -> column kept per vessel
+AIS_COLUMNS = {
+    "latitude": "latitude",
+    "longitude": "longitude",
+    "sog": "sog",
+    "cog": "cog",
+    "true_heading": "heading",
+}
+
+# characters read per chunk when streaming AIS exports
+CHUNK_SIZE = 1 << 20
+
+# compact types of the Kystdatahuset fields, anything else is left to numpy
+FIELD_TYPES = {
+    "mmsi": np.int64,
+    "sog": np.float64,
+    "cog": np.float64,
+    "true_heading": np.float64,
+    "nav_status": np.int16,
+    "message_nr": np.int16,
+    "rot": np.float64,
+    "dist_prevpoint": np.float64,
+    "sec_prevpoint": np.float64,
+    "calc_speed": np.float64,
+    # strings of any length, a fixed width string dtype would silently truncate them
+    "source": object,
+    "longitude": np.float64,
+    "latitude": np.float64,
+}
+
+WHITESPACE = " \t\r\n"
+
+
+def iter_records(file, chunk_size: int = CHUNK_SIZE):
+    # yields the objects of a top level json array one by one, only one chunk and one object are held at a time
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    end_of_file = False
+    while True:
+        while position < len(buffer) and buffer[position] in WHITESPACE + ("," if started else ""):
+            position += 1
+        if position < len(buffer) and not started:
+            if buffer[position] != "[":
+                raise ValueError(f"expected a json array, found {buffer[position]!r}")
+            started = True
+            position += 1
+            continue
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        if position < len(buffer):
+            try:
+                record, position = decoder.raw_decode(buffer, position)
+                yield record
+                continue
+            except json.JSONDecodeError:
+                if end_of_file:
+                    raise
+        elif end_of_file:
+            raise ValueError("unexpected end of json array")
+        chunk = file.read(chunk_size)
+        end_of_file = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def _chunk_columns(records: list[dict], fields: tuple[str, ...]) -> dict[str, np.ndarray]:
+    columns = {"date_time_utc": ingest.parse_timestamps([record["date_time_utc"].encode() for record in records])}
+    for field in fields:
+        if field == "date_time_utc":
+            continue
+        values = [record.get(field) for record in records]
+        dtype = FIELD_TYPES.get(field)
+        if dtype is not None and np.issubdtype(dtype, np.integer) and any(value is None for value in values):
+            dtype = np.float64
+        columns[field] = np.array(values, dtype=dtype)
+    return columns
+
+
+def read_json(file_path, fields: tuple[str, ...] = ("mmsi", "latitude", "longitude"), mmsis=None,
+              date_time_start: datetime = None, date_time_end: datetime = None,
+              chunk_size: int = CHUNK_SIZE) -> dict[str, np.ndarray]:
+    # streams a Kystdatahuset export into typed columns, "date_time_utc" is always included as datetime64[ns].
+    # fixes of other vessels or outside the window are dropped while reading, so memory follows the result
+    mmsis = None if mmsis is None else set(mmsis)
+    start = to_datetime64(date_time_start, EARLIEST)
+    end = to_datetime64(date_time_end, LATEST)
+    chunks = []
+    records = []
+
+    def flush():
+        if records:
+            columns = _chunk_columns(records, fields)
+            keep = (columns["date_time_utc"] >= start) & (columns["date_time_utc"] <= end)
+            chunks.append({field: column[keep] for field, column in columns.items()})
+            records.clear()
+
+    with open(file_path) as file:
+        for record in iter_records(file, chunk_size):
+            if mmsis is None or record.get("mmsi") in mmsis:
+                records.append(record)
+                if len(records) >= 10_000:
+                    flush()
+        flush()
+
+    names = ("date_time_utc",) + tuple(field for field in fields if field != "date_time_utc")
+    if not chunks:
+        return {name: np.array([], dtype='datetime64[ns]' if name == "date_time_utc" else FIELD_TYPES.get(name, float))
+                for name in names}
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in names}
+
+
+class Track:
+    # the AIS fixes of one vessel as columns sorted by time
+    def __init__(self, mmsi: int, time_stamps: np.ndarray, columns: dict[str, np.ndarray]):
+        self.mmsi = mmsi
+        self.time_stamps = time_stamps
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.time_stamps)
+
+    def __repr__(self) -> str:
+        return f"Track(mmsi={self.mmsi}, length={len(self)})"
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        # track.latitude, track.sog, ...
+        columns = self.__dict__.get("columns", {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def _slice(self, left: int, right: int) -> "Track":
+        return Track(self.mmsi, self.time_stamps[left:right],
+                     {name: column[left:right] for name, column in self.columns.items()})
+
+    def window(self, date_time_start: datetime, date_time_end: datetime) -> "Track":
+        return self.windows([(date_time_start, date_time_end)])[0]
+
+    def windows(self, windows: list[tuple[datetime, datetime]]) -> list["Track"]:
+        # binary search on the time index, every window shares memory with the track
+        starts = np.array([to_datetime64(start, EARLIEST) for start, _ in windows], dtype='datetime64[ns]')
+        ends = np.array([to_datetime64(end, LATEST) for _, end in windows], dtype='datetime64[ns]')
+        lefts = np.searchsorted(self.time_stamps, starts, side="left")
+        rights = np.searchsorted(self.time_stamps, ends, side="right")
+        return [self._slice(left, right) for left, right in zip(lefts, rights)]
+
+
+class AisStore:
+    # AIS data of many vessels, loaded once and sliced per route
+    def __init__(self, tracks: dict[int, Track]):
+        self.tracks = tracks
+
+    def __len__(self) -> int:
+        return sum(len(track) for track in self.tracks.values())
+
+    def __repr__(self) -> str:
+        return f"AisStore(vessels={len(self.tracks)}, fixes={len(self)})"
+
+    def __getitem__(self, mmsi: int) -> Track:
+        return self.tracks[mmsi]
+
+    def __iter__(self):
+        return iter(self.tracks.values())
+
+    def mmsis(self) -> list[int]:
+        return list(self.tracks)
+
+    @classmethod
+    def from_columns(cls, mmsi: np.ndarray, time_stamps: np.ndarray, columns: dict[str, np.ndarray]) -> "AisStore":
+        # one sort by vessel then time, every vessel is then a contiguous slice
+        order = np.lexsort((time_stamps, mmsi))
+        mmsi, time_stamps = mmsi[order], time_stamps[order]
+        columns = {name: column[order] for name, column in columns.items()}
+        starts = np.concatenate(([0], np.flatnonzero(mmsi[1:] != mmsi[:-1]) + 1)) if len(mmsi) else np.array([], dtype=int)
+        ends = np.append(starts[1:], len(mmsi))
+        tracks = {}
+        for start, end in zip(starts, ends):
+            tracks[int(mmsi[start])] = Track(int(mmsi[start]), time_stamps[start:end],
+                                             {name: column[start:end] for name, column in columns.items()})
+        return cls(tracks)
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> "AisStore":
+        mmsi = np.fromiter((record["mmsi"] for record in records), dtype=np.int64, count=len(records))
+        # "2024-09-10T00:00:02+00:00"
+        time_stamps = ingest.parse_timestamps([record["date_time_utc"].encode() for record in records])
+        columns = {column: np.array([record.get(field, np.nan) for record in records], dtype=float)
+                   for field, column in AIS_COLUMNS.items()}
+        return cls.from_columns(mmsi, time_stamps, columns)
+
+    @classmethod
+    def from_json(cls, file_paths: list[str], mmsis=None, date_time_start: datetime = None,
+                  date_time_end: datetime = None) -> "AisStore":
+        fields = ("mmsi",) + tuple(AIS_COLUMNS)
+        parts = [read_json(file_path, fields, mmsis, date_time_start, date_time_end) for file_path in file_paths]
+        if not parts:
+            return cls({})
+        columns = {field: np.concatenate([part[field] for part in parts]) for field in ("date_time_utc",) + fields}
+        return cls.from_columns(columns["mmsi"], columns["date_time_utc"],
+                                {column: columns[field].astype(float) for field, column in AIS_COLUMNS.items()})
+
+    def window(self, date_time_start: datetime, date_time_end: datetime) -> dict[int, Track]:
+        # vessels without fixes in the window are left out
+        windows = {mmsi: track.window(date_time_start, date_time_end) for mmsi, track in self.tracks.items()}
+        return {mmsi: track for mmsi, track in windows.items() if len(track)}
+
+    def extent(self) -> tuple[float, float, float, float]:
+        # (longitude min, longitude max, latitude min, latitude max) the order ax.set_extent takes
+        tracks = [track for track in self.tracks.values() if len(track)]
+        if not tracks:
+            raise ValueError("cannot compute the extent of an empty AisStore")
+        longitudes = [(np.nanmin(track.longitude), np.nanmax(track.longitude)) for track in tracks]
+        latitudes = [(np.nanmin(track.latitude), np.nanmax(track.latitude)) for track in tracks]
+        return (float(min(low for low, _ in longitudes)), float(max(high for _, high in longitudes)),
+                float(min(low for low, _ in latitudes)), float(max(high for _, high in latitudes)))
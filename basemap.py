@@ -0,0 +1,81 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import matplotlib.pyplot as plt
+import numpy as np
+
+CACHE_DIRECTORY = Path(os.environ.get("BASEMAP_CACHE_DIR", ".cache/basemap"))
+
+# (feature name, style) drawn in this order, part of the cache key so a style change renders a new background
+FEATURES = (
+    ("OCEAN", {"facecolor": "lightblue"}),
+    ("LAND", {"facecolor": "lightgreen"}),
+    ("LAKES", {"facecolor": "darkblue"}),
+    ("RIVERS", {"edgecolor": "blue"}),
+    ("COASTLINE", {"edgecolor": "black"}),
+)
+
+_images = {}
+
+
+def _key(extent: tuple[float, float, float, float], projection, dpi: int, width: float) -> str:
+    description = {
+        "extent": [round(value, 6) for value in extent],
+        "projection": projection.proj4_init,
+        "dpi": dpi,
+        "width": width,
+        "features": FEATURES,
+    }
+    return hashlib.sha1(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+def cached_render(key: str, draw, dpi: int = 300) -> Path:
+    # the png of key, draw() returns the figure and is only called when nothing is cached yet
+    file_path = CACHE_DIRECTORY / f"{key}.png"
+    if file_path.exists():
+        return file_path
+    figure = draw()
+    CACHE_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    temporary = file_path.with_name(f"{file_path.stem}.tmp{os.getpid()}.png")
+    figure.savefig(temporary, dpi=dpi)
+    plt.close(figure)
+    os.replace(temporary, file_path)
+    return file_path
+
+
+def image(file_path: Path) -> np.ndarray:
+    if file_path not in _images:
+        _images[file_path] = plt.imread(file_path)
+    return _images[file_path]
+
+
+def render(extent: tuple[float, float, float, float], projection=None, dpi: int = 300, width: float = 12) -> Path:
+    # rasterizes the natural earth features of extent (lon min, lon max, lat min, lat max) once into a png.
+    # cartopy is imported here, the cache itself works without it
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+
+    projection = projection or ccrs.PlateCarree()
+
+    def draw() -> plt.Figure:
+        figure = plt.figure(figsize=(width, width))
+        ax = figure.add_axes((0, 0, 1, 1), projection=projection)
+        ax.set_extent(extent, crs=ccrs.PlateCarree())
+        # the figure takes the aspect of the projected extent, so the image fills exactly that extent
+        x_min, x_max, y_min, y_max = ax.get_extent()
+        figure.set_size_inches(width, width * (y_max - y_min) / (x_max - x_min))
+        ax.set_axis_off()
+        for name, style in FEATURES:
+            ax.add_feature(getattr(cfeature, name), **style)
+        return figure
+    return cached_render(_key(extent, projection, dpi, width), draw, dpi)
+
+
+def add_background(ax: plt.Axes, extent: tuple[float, float, float, float], dpi: int = 300, width: float = 12) -> None:
+    # the cached background as an underlay, only tracks and markers are drawn per figure
+    import cartopy.crs as ccrs
+
+    file_path = render(extent, ax.projection, dpi, width)
+    ax.set_extent(extent, crs=ccrs.PlateCarree())
+    ax.imshow(image(file_path), origin="upper", extent=ax.get_extent(), transform=ax.projection, zorder=0)
@@ -0,0 +1,274 @@
+from pathlib import Path
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+from scipy.signal import lfilter
+from timeseries import TimeSeries
+from dataset import Dataset
+from energy import EnergyChain
+from frame import align
+from ais import AisStore
+import filter as f
+import cache
+import main
+import transform
+
+START = np.datetime64("2024-09-10T06:00:00", "ns")
+
+# (directory, file, unit, typical value, noise) of the synthetic RVG_mqtt tree
+SIGNALS = [
+    *[(f"Engine{engine}", signal, unit, value, noise)
+      for engine in (1, 2, 3)
+      for signal, unit, value, noise in (("engine_load", "kilowatt", 150.0, 80.0),
+                                         ("fuel_consumption", "l/h", 40.0, 15.0),
+                                         ("engine_speed", "rpm", 1800.0, 5.0))],
+    *[(thruster, signal, unit, value, noise)
+      for thruster in ("hcx_port_mp", "hcx_stbd_mp")
+      for signal, unit, value, noise in (("LoadFeedback", "%", 30.0, 20.0), ("RPMFeedback", "rpm", 120.0, 40.0))],
+    ("SeapathGPSVtg", "SpeedKmHr", "km/h", 15.0, 5.0),
+]
+
+
+# samples generated and written at a time, memory stays flat from 1e4 up to 1e8 samples
+CHUNK_SIZE = 1 << 16
+
+
+def _time_steps(rng: np.random.Generator, count: int) -> np.ndarray:
+    # about 1 Hz with jitter and the occasional gap, like the logger, in nanoseconds
+    steps = rng.gamma(4.0, 0.25, count) * 1e9
+    steps[rng.random(count) < 0.01] *= 30
+    return steps.astype(np.int64)
+
+
+def _chunks(rng: np.random.Generator, count: int):
+    # (time stamps, standard normal shocks) chunk by chunk, the time stamps continue across chunks
+    offset = 0
+    for chunk_start in range(0, count, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, count - chunk_start)
+        nano_seconds = offset + np.cumsum(_time_steps(rng, size))
+        offset = int(nano_seconds[-1])
+        yield START + nano_seconds.astype("timedelta64[ns]"), rng.standard_normal(size)
+
+
+def _write_csv(file_path: Path, rng: np.random.Generator, count: int, unit: str, value: float, noise: float) -> None:
+    # a mean reverting random walk around value, so long files do not drift away
+    state = np.zeros(1)
+    with open(file_path, "w") as file:
+        for time_stamps, shocks in _chunks(rng, count):
+            walk, state = lfilter([noise / 10], [1, -0.99], shocks, zi=state)
+            values = np.clip(value + walk, 0, None)
+            stamps = np.char.add(np.datetime_as_string(time_stamps, unit="ns"), "Z,")
+            lines = np.char.add(np.char.add(stamps, np.char.mod("%.6f", values)), f",{unit}\n")
+            file.write("".join(lines.tolist()))
+
+
+def _write_ais(file_path: Path, rng: np.random.Generator, count: int) -> np.datetime64:
+    # a json list like the Kystdatahuset exports, written chunk by chunk
+    latitude, longitude = 63.44, 10.39
+    separator = ""
+    with open(file_path, "w") as file:
+        file.write("[")
+        for time_stamps, shocks in _chunks(rng, count):
+            latitudes = latitude + np.cumsum(shocks * 1e-4)
+            longitudes = longitude + np.cumsum(rng.normal(0, 2e-4, len(shocks)))
+            latitude, longitude = latitudes[-1], longitudes[-1]
+            mmsis = rng.choice([258342000, 257012170, 258027530, 257090930], len(shocks))
+            records = [{"mmsi": int(mmsi), "date_time_utc": f"{str(time_stamp)[:19]}+00:00", "sog": round(float(sog), 1),
+                        "cog": 141.5, "true_heading": 201, "nav_status": 0, "message_nr": 1, "rot": 0,
+                        "dist_prevpoint": -99, "sec_prevpoint": -99, "calc_speed": -99, "source": "g",
+                        "longitude": round(float(lon), 4), "latitude": round(float(lat), 4)}
+                       for mmsi, time_stamp, sog, lon, lat in
+                       zip(mmsis, time_stamps, rng.gamma(2, 3, len(shocks)), longitudes, latitudes)]
+            for record in records:
+                file.write(separator + "\n  " + json.dumps(record))
+                separator = ","
+        file.write("\n]\n")
+    return time_stamps[-1]
+
+
+def generate(directory: Path, samples: int, seed: int = 0) -> dict:
+    # RVG_mqtt style csv files with samples in total, and an AIS export of about samples / 10 fixes
+    rng = np.random.default_rng(seed)
+    per_signal = max(2, samples // len(SIGNALS))
+    for unit_directory, signal, unit, value, noise in SIGNALS:
+        file_path = directory / "RVG_mqtt" / unit_directory / f"{signal}.csv"
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        _write_csv(file_path, rng, per_signal, unit, value, noise)
+
+    fixes = max(2, samples // 10)
+    ais_path = directory / "positions.json"
+    end = _write_ais(ais_path, rng, fixes)
+    return {"directory": directory, "ais": ais_path, "start": START, "end": end, "fixes": fixes, "samples": per_signal}
+
+
+class Context:
+    def __init__(self, data: dict):
+        self.data = data
+        self.csv = data["directory"] / "RVG_mqtt" / "Engine1" / "fuel_consumption.csv"
+        self.dataset = Dataset(data["directory"].glob("**/*.csv"), main.construct_label)
+        self.dataset.preload([f.is_engine_load, f.is_engine_fuel_consumption, f.is_thruster_load])
+        start, end = data["start"].astype("datetime64[s]").item(), data["end"].astype("datetime64[s]").item()
+        self.route = ("benchmark", start, end)
+        span = (end - start) / 10
+        self.windows = [(start + span * index, start + span * (index + 1)) for index in range(10)]
+
+
+def bench_from_csv(context: Context) -> int:
+    return len(TimeSeries.from_csv(context.csv, "fuel", cache_mode="off").values)
+
+
+def bench_from_csv_cached(context: Context) -> int:
+    return len(TimeSeries.from_csv(context.csv, "fuel", cache_mode="on").values)
+
+
+def bench_filter_date(context: Context) -> int:
+    ts = context.dataset.select(f.is_engine_load)[0]
+    return sum(len(window.values) for window in ts.filter_dates(context.windows))
+
+
+def bench_interpolate(context: Context) -> int:
+    load, fuel = context.dataset.select(f.is_engine_load)[0], context.dataset.select(f.is_engine_fuel_consumption)[0]
+    load = TimeSeries(load.time_stamps, load.values, load.label, load.unit)
+    fuel = TimeSeries(fuel.time_stamps, fuel.values, fuel.label, fuel.unit)
+    load.interpolate(fuel)
+    return len(load.values)
+
+
+def bench_add(context: Context) -> int:
+    port, starboard = context.dataset.select(f.is_thruster_load)
+    return len((port + starboard).values)
+
+
+def bench_sum(context: Context) -> int:
+    loads = context.dataset.select(f.is_thruster_load) + context.dataset.select(f.is_engine_fuel_consumption)
+    for ts in loads:
+        ts.unit = None
+    return len(align(loads).sum().values)
+
+
+def bench_transform(context: Context) -> int:
+    ts = context.dataset.select(f.is_thruster_load)[0]
+    return len(ts.transform(transform.thruster_load, "W").values)
+
+
+def bench_energy_chain(context: Context) -> int:
+    return len(EnergyChain(context.dataset).get("fuel_consumption", context.route).values)
+
+
+def bench_energy_plots(context: Context) -> int:
+    # the main.py energy functions, rendering included
+    main.cumulative_fuel_consumption("Cumulative fuel consumption", context.route, context.dataset)
+    main.theoretical_fuel_consumption("Theoretical fuel consumption", context.route, EnergyChain(context.dataset))
+    return sum(len(ts.values) for ts in context.dataset.select(f.is_engine_fuel_consumption, context.route))
+
+
+def bench_ais_from_json(context: Context) -> int:
+    # AisStore.from_json replaced position.load_and_sort_json, and unlike position.py it loads without cartopy
+    return len(AisStore.from_json([context.data["ais"]]))
+
+
+def bench_plot(context: Context) -> int:
+    ts = context.dataset.select(f.is_engine_load)[0]
+    figure, ax = main.get_new_plot()
+    ts.plot(ax, "Engine load", context.route)
+    figure.savefig(Path("plots") / "benchmark.png")
+    plt.close(figure)
+    return len(ts.values)
+
+
+BENCHMARKS = {name.removeprefix("bench_"): function for name, function in globals().items() if name.startswith("bench_")}
+
+
+def measure(function, context: Context, repeat: int) -> dict:
+    function(context)
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        samples = function(context)
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    function(context)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    seconds = min(times)
+    return {"seconds": seconds, "samples": samples, "samples_per_second": samples / seconds if seconds else None,
+            "peak_bytes": peak}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None or reference["samples"] != result["samples"]:
+            continue
+        if result["seconds"] > reference["seconds"] * (1 + tolerance):
+            regressions.append(f"{name}: {result['seconds']:.4f} s, baseline {reference['seconds']:.4f} s")
+        if result["peak_bytes"] > reference["peak_bytes"] * (1 + tolerance):
+            regressions.append(f"{name}: peak {result['peak_bytes']} B, baseline {reference['peak_bytes']} B")
+    return regressions
+
+
+def run(args) -> int:
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise SystemExit(f"unknown benchmarks {sorted(unknown)}, expected some of {sorted(BENCHMARKS)}")
+
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="timeseries-benchmark-") as directory:
+        # everything the benchmarks write, csv files, cache entries and plots, stays in the temporary directory
+        os.chdir(directory)
+        cache_directory = cache.CACHE_DIRECTORY
+        cache.CACHE_DIRECTORY = Path(directory) / "cache"
+        Path("plots").mkdir()
+        try:
+            started = time.perf_counter()
+            data = generate(Path(directory) / "data", int(args.samples), args.seed)
+            print(f"generated {int(args.samples)} samples and {data['fixes']} AIS fixes in "
+                  f"{time.perf_counter() - started:.2f} s", file=sys.stderr)
+            context = Context(data)
+            results = {}
+            for name in names:
+                results[name] = measure(BENCHMARKS[name], context, args.repeat)
+                result = results[name]
+                print(f"{name:24} {result['seconds'] * 1000:10.2f} ms {result['samples_per_second'] or 0:14.0f} samples/s "
+                      f"{result['peak_bytes'] / 2**20:10.1f} MiB peak")
+        finally:
+            os.chdir(working_directory)
+            cache.CACHE_DIRECTORY = cache_directory
+
+    report = {"samples": int(args.samples), "python": platform.python_version(), "numpy": np.__version__,
+              "results": results}
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmarks of the hot paths on synthetic Gunnerus-shaped data")
+    parser.add_argument("--samples", type=float, default=1e5, help="csv samples in total, 1e4 to 1e8")
+    parser.add_argument("--repeat", type=int, default=3, help="the fastest of this many runs is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", default=None, help=f"comma separated subset of {','.join(BENCHMARKS)}")
+    parser.add_argument("--output", default=None, help="write the results as json")
+    parser.add_argument("--baseline", default=None, help="compare with a saved run, exit 1 on regressions")
+    parser.add_argument("--save-baseline", default=None, help="save this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slow down and memory growth")
+    sys.exit(run(parser.parse_args()))
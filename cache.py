@@ -0,0 +1,104 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+CACHE_DIRECTORY = Path(os.environ.get("TIMESERIES_CACHE_DIR", ".cache/timeseries"))
+CACHE_MAX_BYTES = int(os.environ.get("TIMESERIES_CACHE_MAX_BYTES", 1 << 30))
+
+# "on": read and write the cache, "off": bypass it, "rebuild": reparse and overwrite entries
+CACHE_MODE = os.environ.get("TIMESERIES_CACHE", "on")
+CACHE_MODES = ("on", "off", "rebuild")
+
+META_FILE = "meta.json"
+TIME_STAMPS_FILE = "time_stamps.npy"
+VALUES_FILE = "values.npy"
+
+
+def _entry_directory(file_path) -> Path:
+    key = hashlib.sha1(str(Path(file_path).resolve()).encode()).hexdigest()
+    return CACHE_DIRECTORY / key
+
+
+def _signature(file_path) -> dict:
+    stat = os.stat(file_path)
+    return {"source": str(Path(file_path).resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _entry_size(directory: Path) -> int:
+    return sum(file.stat().st_size for file in directory.iterdir())
+
+
+def write_columns(directory: Path, time_stamps: np.ndarray, values: np.ndarray, meta: dict) -> None:
+    # columns are written next to the final location and swapped in, so readers never see half an entry
+    temporary = directory.with_name(f"{directory.name}.tmp{os.getpid()}")
+    shutil.rmtree(temporary, ignore_errors=True)
+    temporary.mkdir(parents=True)
+    np.save(temporary / TIME_STAMPS_FILE, np.asarray(time_stamps, dtype="datetime64[ns]"))
+    np.save(temporary / VALUES_FILE, np.asarray(values, dtype=np.float64))
+    (temporary / META_FILE).write_text(json.dumps(meta))
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(temporary, directory)
+
+
+def read_columns(directory: Path) -> tuple[np.ndarray, np.ndarray, dict]:
+    meta = json.loads((directory / META_FILE).read_text())
+    time_stamps = np.load(directory / TIME_STAMPS_FILE, mmap_mode="r")
+    values = np.load(directory / VALUES_FILE, mmap_mode="r")
+    return time_stamps, values, meta
+
+
+def load(file_path) -> tuple[np.ndarray, np.ndarray, str | None] | None:
+    directory = _entry_directory(file_path)
+    try:
+        time_stamps, values, meta = read_columns(directory)
+    except (FileNotFoundError, ValueError):
+        return None
+    signature = _signature(file_path)
+    if any(meta.get(key) != value for key, value in signature.items()):
+        return None
+    # directory mtime doubles as last access time for eviction
+    os.utime(directory)
+    return time_stamps, values, meta["unit"]
+
+
+def store(file_path, time_stamps: np.ndarray, values: np.ndarray, unit: str | None, label: str) -> None:
+    meta = {**_signature(file_path), "unit": unit, "label": label}
+    write_columns(_entry_directory(file_path), time_stamps, values, meta)
+    evict()
+
+
+def evict(max_bytes: int = None) -> None:
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not CACHE_DIRECTORY.exists():
+        return
+    entries = [entry for entry in CACHE_DIRECTORY.iterdir() if entry.is_dir() and ".tmp" not in entry.name]
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    total = 0
+    for entry in entries:
+        total += _entry_size(entry)
+        if total > max_bytes:
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def clear() -> None:
+    shutil.rmtree(CACHE_DIRECTORY, ignore_errors=True)
+
+
+def read_csv(file_path, label: str, reader, mode: str = None) -> tuple[np.ndarray, np.ndarray, str | None]:
+    mode = mode or CACHE_MODE
+    if mode not in CACHE_MODES:
+        raise ValueError(f"unknown cache mode {mode}, expected one of {CACHE_MODES}")
+    if mode == "off":
+        return reader(file_path)
+    if mode == "on" and (cached := load(file_path)) is not None:
+        return cached
+    time_stamps, values, unit = reader(file_path)
+    try:
+        store(file_path, time_stamps, values, unit, label)
+    except OSError:
+        # a read only checkout should still be able to parse the data
+        pass
+    return time_stamps, values, unit
@@ -0,0 +1,57 @@
+from functools import partial
+from timeseries import TimeSeries
+import ingest
+import lazy
+
+
+class Dataset:
+    def __init__(self, file_paths, labeler):
+        self.file_paths = sorted(file_paths)
+        self.labeler = labeler
+        self._signals = {}
+
+    def paths(self, predicate) -> list:
+        return [file_path for file_path in self.file_paths if predicate(file_path)]
+
+    def load(self, file_path, label: str = None) -> TimeSeries:
+        # label overrides the labeler, e.g. for signals the labeler does not know
+        label = self.labeler(file_path) if label is None else label
+        if file_path not in self._signals:
+            ts = TimeSeries.from_csv(file_path, label)
+            # every route and plot shares these arrays, so nobody gets to modify them in place
+            ts.time_stamps.flags.writeable = False
+            ts.values.flags.writeable = False
+            self._signals[file_path] = ts
+        ts = self._signals[file_path]
+        if ts.label != label:
+            return TimeSeries(ts.time_stamps, ts.values, label, ts.unit)
+        return ts
+
+    def unit(self, file_path) -> str | None:
+        if file_path in self._signals:
+            return self._signals[file_path].unit
+        return ingest.read_unit(file_path)
+
+    def preload(self, predicates) -> None:
+        for predicate in predicates:
+            for file_path in self.paths(predicate):
+                self.load(file_path)
+
+    def window(self, ts: TimeSeries, route) -> TimeSeries:
+        if route is None:
+            return ts.filter_date(None, None)
+        return ts.filter_date(route[1], route[2])
+
+    def windows(self, ts: TimeSeries, routes) -> list[TimeSeries]:
+        return ts.filter_dates([(route[1], route[2]) for route in routes])
+
+    def lazy(self, predicate, route=None) -> list[lazy.Leaf]:
+        # deferred signals, nothing is parsed until the expression built from them is evaluated
+        leaves = [lazy.Leaf(partial(self.load, file_path), self.labeler(file_path), self.unit(file_path))
+                  for file_path in self.paths(predicate)]
+        if route is None:
+            return leaves
+        return [leaf.restrict(route[1], route[2]) for leaf in leaves]
+
+    def select(self, predicate, route=None) -> list[TimeSeries]:
+        return [self.window(self.load(file_path), route) for file_path in self.paths(predicate)]
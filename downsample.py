@@ -0,0 +1,102 @@
+import matplotlib.pyplot as plt
+import numpy as np
+
+# a series is only reduced when it has more than this many points per horizontal pixel of the axes
+POINTS_PER_PIXEL = 2
+METHODS = ("min_max", "lttb")
+
+
+def pixel_width(ax: plt.Axes) -> int:
+    return max(1, int(ax.get_window_extent().width))
+
+
+def _numeric(x: np.ndarray) -> np.ndarray:
+    return x.astype(np.int64).astype(np.float64) if np.issubdtype(x.dtype, np.datetime64) else x.astype(np.float64)
+
+
+def min_max(x: np.ndarray, y: np.ndarray, buckets: int) -> np.ndarray:
+    # indices of the first, last, lowest and highest sample of every bucket of equal width on x.
+    # every pixel column keeps its vertical extent, so peaks are drawn exactly as without downsampling
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= 4 * buckets:
+        return valid
+    x_valid = _numeric(x[valid])
+    span = x_valid[-1] - x_valid[0]
+    if span == 0:
+        return valid[[0, -1]]
+    bins = np.minimum(((x_valid - x_valid[0]) / span * buckets).astype(np.int64), buckets - 1)
+    order = np.lexsort((y[valid], bins))
+    starts = np.flatnonzero(np.diff(bins[order], prepend=-1))
+    ends = np.append(starts[1:], len(order)) - 1
+    bucket_starts = np.flatnonzero(np.diff(bins, prepend=-1))
+    bucket_ends = np.append(bucket_starts[1:], len(bins)) - 1
+    picked = np.concatenate((order[starts], order[ends], bucket_starts, bucket_ends))
+    return valid[np.unique(picked)]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    # largest triangle three buckets, keeps the points that span the largest triangles with their neighbours
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= threshold or threshold < 3:
+        return valid
+    x_valid, y_valid = _numeric(x[valid]), y[valid]
+    every = (len(valid) - 2) / (threshold - 2)
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, len(valid) - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = int(bucket * every) + 1, int((bucket + 1) * every) + 1
+        next_start, next_end = end, min(int((bucket + 2) * every) + 1, len(valid))
+        average_x = x_valid[next_start:next_end].mean()
+        average_y = y_valid[next_start:next_end].mean()
+        areas = np.abs((x_valid[previous] - average_x) * (y_valid[start:end] - y_valid[previous])
+                       - (x_valid[previous] - x_valid[start:end]) * (average_y - y_valid[previous]))
+        previous = start + int(np.argmax(areas))
+        picked[bucket + 1] = previous
+    return valid[np.unique(picked)]
+
+
+def series_indices(ax: plt.Axes, x: np.ndarray, y: np.ndarray, method: str = "min_max") -> np.ndarray | None:
+    # None when the series is small enough to be drawn as it is
+    if method not in METHODS:
+        raise ValueError(f"unknown downsampling method {method}, expected one of {METHODS}")
+    buckets = pixel_width(ax)
+    if len(x) <= POINTS_PER_PIXEL * buckets:
+        return None
+    return min_max(x, y, buckets) if method == "min_max" else lttb(x, y, POINTS_PER_PIXEL * buckets)
+
+
+def douglas_peucker(x: np.ndarray, y: np.ndarray, tolerance: float) -> np.ndarray:
+    # indices of a simplified track that stays within tolerance of every original fix
+    if len(x) <= 2:
+        return np.arange(len(x))
+    keep = np.zeros(len(x), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(x) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        length = np.hypot(dx, dy)
+        inner_x, inner_y = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        if length == 0:
+            distances = np.hypot(inner_x, inner_y)
+        else:
+            distances = np.abs(dx * inner_y - dy * inner_x) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            middle = start + 1 + farthest
+            keep[middle] = True
+            stack.append((start, middle))
+            stack.append((middle, end))
+    return np.flatnonzero(keep)
+
+
+def track_indices(ax: plt.Axes, longitudes: np.ndarray, latitudes: np.ndarray,
+                  extent: tuple[float, float, float, float]) -> np.ndarray | None:
+    # fixes closer than half a pixel to the simplified track are dropped
+    if len(longitudes) <= pixel_width(ax):
+        return None
+    tolerance = 0.5 * (extent[1] - extent[0]) / pixel_width(ax)
+    return douglas_peucker(longitudes, latitudes, tolerance)
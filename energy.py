@@ -0,0 +1,123 @@
+from timeseries import TimeSeries
+import filter as f
+import transform
+
+DEFAULT_PARAMETERS = {
+    "efficiency_switchboard": 0.99,
+    "efficiency_frequency_converter": 0.97,
+    "efficiency_generator": 0.96,
+    "electrical_efficiency": 0.922,
+    "diesel_heating_value": 45.4e6,
+}
+
+
+class Stage:
+    def __init__(self, name: str, compute, inputs: tuple[str, ...] = (), parameters: tuple[str, ...] = ()):
+        self.name = name
+        self.compute = compute
+        self.inputs = inputs
+        self.parameters = parameters
+
+
+def thrusters_power(dataset, route) -> TimeSeries:
+    # one alignment for all thrusters instead of one per addition
+    thrusters_load = dataset.lazy(f.is_thruster_load, route)
+    ts_thrusters_power = sum(load.transform(transform.thruster_load, "W") for load in thrusters_load).evaluate()
+    ts_thrusters_power.label = "Thrusters power"
+    return ts_thrusters_power
+
+
+def engines_power(dataset, route, ts_thrusters_power, **efficiencies) -> TimeSeries:
+    def to_engine_power(power):
+        return transform.thruster_power_to_engine_power(power, **efficiencies)
+    ts_engines_power = ts_thrusters_power.transform(to_engine_power, "W")
+    ts_engines_power.label = "Theoretical power engines"
+    return ts_engines_power
+
+
+def engines_load(dataset, route, ts_engines_power) -> TimeSeries:
+    ts_engines_load = ts_engines_power.transform(transform.engine_power_to_total_load, "%")
+    ts_engines_load.label = "Theoretical engines load"
+    return ts_engines_load
+
+
+def engines_efficiency(dataset, route, ts_engines_power) -> TimeSeries:
+    # straight from the engine power in one pass, the load in between is never stored as a series
+    ts_engines_efficiency = ts_engines_power.transform(
+        transform.chain(transform.engine_power_to_total_load, transform.engine_efficiency_emperical), "%")
+    ts_engines_efficiency.label = "Theoretical engines efficiency"
+    return ts_engines_efficiency
+
+
+def fuel_mass_flow(dataset, route, ts_thrusters_power, ts_engines_efficiency,
+                   electrical_efficiency, diesel_heating_value) -> TimeSeries:
+    def to_fuel_mass_flow(thrust, efficiency_percent):
+        return thrust / (electrical_efficiency * diesel_heating_value * transform.from_percent_to_fraction(efficiency_percent))
+    ts_fuel_mass_flow = ts_thrusters_power.transform(to_fuel_mass_flow, "kg/s", ts_engines_efficiency)
+    ts_fuel_mass_flow.label = "Engines fuel mass flow"
+    return ts_fuel_mass_flow
+
+
+def fuel_consumption(dataset, route, ts_fuel_mass_flow) -> TimeSeries:
+    ts_fuel_consumption = ts_fuel_mass_flow.cumulative_integral(method="left")
+    ts_fuel_consumption.label = "Engines fuel consumption"
+    return ts_fuel_consumption
+
+
+# thruster load feedback -> thruster power -> switchboard/converter/generator -> engine load -> fuel
+STAGES = [
+    Stage("thrusters_power", thrusters_power),
+    Stage("engines_power", engines_power, ("thrusters_power",),
+          ("efficiency_switchboard", "efficiency_frequency_converter", "efficiency_generator")),
+    Stage("engines_load", engines_load, ("engines_power",)),
+    Stage("engines_efficiency", engines_efficiency, ("engines_power",)),
+    Stage("fuel_mass_flow", fuel_mass_flow, ("thrusters_power", "engines_efficiency"),
+          ("electrical_efficiency", "diesel_heating_value")),
+    Stage("fuel_consumption", fuel_consumption, ("fuel_mass_flow",)),
+]
+
+
+class EnergyChain:
+    def __init__(self, dataset, parameters: dict = None, stages: list[Stage] = None):
+        self.dataset = dataset
+        self.parameters = {**DEFAULT_PARAMETERS, **(parameters or {})}
+        self.stages = {stage.name: stage for stage in (stages or STAGES)}
+        self._cache = {}
+
+    def set_parameters(self, **parameters) -> None:
+        # cached stages are keyed by the parameters they depend on, so only dependent stages recompute
+        unknown = set(parameters) - set(self.parameters)
+        if unknown:
+            raise KeyError(f"unknown energy chain parameters {unknown}")
+        self.parameters.update(parameters)
+
+    def dependencies(self, name: str) -> set[str]:
+        stage = self.stages[name]
+        parameters = set(stage.parameters)
+        for input_name in stage.inputs:
+            parameters |= self.dependencies(input_name)
+        return parameters
+
+    def _key(self, name: str, route) -> tuple:
+        parameters = tuple((parameter, self.parameters[parameter]) for parameter in sorted(self.dependencies(name)))
+        return name, route, parameters
+
+    def _compute(self, name: str, route) -> TimeSeries:
+        key = self._key(name, route)
+        if key not in self._cache:
+            stage = self.stages[name]
+            inputs = [self._compute(input_name, route) for input_name in stage.inputs]
+            parameters = {parameter: self.parameters[parameter] for parameter in stage.parameters}
+            ts = stage.compute(self.dataset, route, *inputs, **parameters)
+            ts.time_stamps.flags.writeable = False
+            ts.values.flags.writeable = False
+            self._cache[key] = ts
+        return self._cache[key]
+
+    def get(self, name: str, route) -> TimeSeries:
+        # every caller gets its own series object on the shared read only arrays, so labels can be changed freely
+        ts = self._compute(name, route)
+        return TimeSeries(ts.time_stamps, ts.values, ts.label, ts.unit)
+
+    def clear(self) -> None:
+        self._cache.clear()
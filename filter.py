@@ -1,10 +1,13 @@
+from pathlib import Path
+
+
 def is_engine2(file_path: str) -> bool:
     return "Engine2" in str(file_path)
 
 
 def get_engine_id(file_path):
-    "data/gunnerus/RVG_mqtt/Engine1"
-    return int(str(file_path)[29])
+    # data/gunnerus/RVG_mqtt/Engine1/fuel_consumption.csv or a store partition of Engine1, wherever the tree lives
+    return int(next(part for part in reversed(Path(file_path).parts) if part.startswith("Engine")).removeprefix("Engine"))
 
 # exclude plotting engine 2 which was not being used
 
@@ -0,0 +1,245 @@
+from datetime import timedelta
+from pathlib import Path
+import argparse
+import os
+import time
+import numpy as np
+from timeseries import TimeSeries
+from ringbuffer import RingTimeSeries
+import filter as f
+import ingest
+import transform
+
+
+class GrowingSeries:
+    # append only series with amortized O(1) appends, the filled part is exposed without copying
+    def __init__(self, label: str, unit: str = None, capacity: int = 1024):
+        self.label = label
+        self.unit = unit
+        self.length = 0
+        self._time_stamps = np.empty(capacity, dtype='datetime64[ns]')
+        self._values = np.empty(capacity, dtype=float)
+
+    @property
+    def time_stamps(self) -> np.ndarray:
+        return self._time_stamps[:self.length]
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values[:self.length]
+
+    def extend(self, time_stamps: np.ndarray, values: np.ndarray) -> None:
+        needed = self.length + len(time_stamps)
+        if needed > len(self._values):
+            capacity = max(needed, 2 * len(self._values))
+            self._time_stamps = np.concatenate((self.time_stamps, np.empty(capacity - self.length, 'datetime64[ns]')))
+            self._values = np.concatenate((self.values, np.empty(capacity - self.length)))
+        self._time_stamps[self.length:needed] = time_stamps
+        self._values[self.length:needed] = values
+        self.length = needed
+
+    def series(self) -> TimeSeries:
+        return TimeSeries(self.time_stamps, self.values, self.label, self.unit)
+
+
+class CsvTail:
+    # remembers how far a growing csv file has been parsed and only parses appended complete lines
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.offset = 0
+        self.partial = b""
+
+    def poll(self) -> tuple[np.ndarray, np.ndarray, str | None]:
+        size = os.stat(self.file_path).st_size
+        if size < self.offset:
+            # the logger truncated or replaced the file
+            self.offset = 0
+            self.partial = b""
+        with open(self.file_path, "rb") as file:
+            file.seek(self.offset)
+            data = file.read(size - self.offset)
+        self.offset += len(data)
+
+        # a line without its newline is still being written, keep it for the next poll
+        data = self.partial + data
+        end = data.rfind(b"\n") + 1
+        self.partial = data[end:]
+        return ingest.parse_block(data[:end])
+
+
+class CumulativeIntegral:
+    # running left rectangle integral, same rule as TimeSeries.cumulative_integral(method="left")
+    def __init__(self, scale: float = 1.0):
+        self.scale = scale
+        self.total = 0.0
+        self.last_time = None
+        self.last_value = None
+
+    def update(self, time_stamps: np.ndarray, values: np.ndarray) -> np.ndarray:
+        if len(time_stamps) == 0:
+            return np.array([], dtype=float)
+        times = time_stamps.astype(np.int64)
+        last_time = times[0] if self.last_time is None else self.last_time
+        last_value = values[0] if self.last_value is None else self.last_value
+        seconds = np.diff(times, prepend=last_time) * 1e-9
+        left_values = np.concatenate(([last_value], values[:-1]))
+        cumulative = self.total + np.cumsum(seconds * left_values) * self.scale
+        self.total = cumulative[-1]
+        self.last_time = times[-1]
+        self.last_value = values[-1]
+        return cumulative
+
+
+class LatestCombination:
+    # combines signals sample by sample using the latest known value of every input, e.g. the sum of all thrusters.
+    # inputs grow at different rates, so samples are only combined up to the watermark, the earliest of the latest
+    # time stamps of all inputs. later samples wait for the next update, which keeps the output in time order
+    def __init__(self, number_of_inputs: int, combine):
+        self.combine = combine
+        self.latest = np.full(number_of_inputs, np.nan)
+        self.watermarks = np.full(number_of_inputs, np.datetime64("NaT"), dtype='datetime64[ns]')
+        self.pending = [(np.array([], dtype='datetime64[ns]'), np.array([], dtype=float))] * number_of_inputs
+
+    def _ready(self, batches: list[tuple[np.ndarray, np.ndarray]]) -> list[tuple[np.ndarray, np.ndarray]]:
+        for index, (batch_time_stamps, batch_values) in enumerate(batches):
+            if len(batch_time_stamps):
+                pending_time_stamps, pending_values = self.pending[index]
+                self.pending[index] = (np.concatenate((pending_time_stamps, batch_time_stamps)),
+                                       np.concatenate((pending_values, batch_values)))
+                self.watermarks[index] = batch_time_stamps[-1]
+        if np.any(np.isnat(self.watermarks)):
+            # an input that has never reported could still report samples before everything seen so far
+            return [(time_stamps[:0], values[:0]) for time_stamps, values in self.pending]
+        watermark = self.watermarks.min()
+        ready = []
+        for index, (time_stamps, values) in enumerate(self.pending):
+            end = np.searchsorted(time_stamps, watermark, side="right")
+            ready.append((time_stamps[:end], values[:end]))
+            self.pending[index] = (time_stamps[end:], values[end:])
+        return ready
+
+    def update(self, batches: list[tuple[np.ndarray, np.ndarray]]) -> tuple[np.ndarray, np.ndarray]:
+        batches = self._ready(batches)
+        time_stamps = np.concatenate([batch_time_stamps for batch_time_stamps, _ in batches])
+        values = np.concatenate([batch_values for _, batch_values in batches])
+        sources = np.concatenate([np.full(len(batch_values), index) for index, (_, batch_values) in enumerate(batches)])
+        order = np.argsort(time_stamps, kind="stable")
+        time_stamps, values, sources = time_stamps[order], values[order], sources[order]
+
+        positions = np.arange(len(values))
+        columns = []
+        for index in range(len(self.latest)):
+            # index of the most recent sample of this input at every position, -1 before its first one
+            last = np.maximum.accumulate(np.where(sources == index, positions, -1)) if len(values) else positions
+            column = np.where(last >= 0, values[last], self.latest[index])
+            if np.any(sources == index):
+                self.latest[index] = column[-1]
+            columns.append(column)
+
+        combined = transform.apply(self.combine, *columns) if columns and len(values) else values
+        complete = ~np.isnan(combined)
+        return time_stamps[complete], combined[complete]
+
+
+class LiveMetrics:
+    # raw signals and derived figures kept up to date in O(new samples). sources are csv paths or mqtt topics,
+    # anything the filter.py predicates recognise
+    def __init__(self, sources: list, labeler=None, horizon: timedelta = None):
+        # with a horizon every series is a ring buffer, so memory stays flat however long the monitor runs
+        def series(label: str, unit: str = None):
+            return GrowingSeries(label, unit) if horizon is None else RingTimeSeries(label, unit, horizon=horizon)
+
+        self.labeler = labeler or (lambda source: f"{Path(source).parent.name} {Path(source).stem}")
+        self.thruster_paths = [source for source in sources if f.is_thruster_load(source)]
+        self.fuel_paths = [source for source in sources if f.is_engine_fuel_consumption(source)]
+        self.load_paths = [source for source in sources if f.is_engine_load(source)]
+        self.sources = self.thruster_paths + self.fuel_paths + self.load_paths
+        self.signals = {source: series(self.labeler(source)) for source in self.sources}
+
+        self.thrusters_power = series("Thrusters power", "W")
+        self._thrusters_power = LatestCombination(
+            len(self.thruster_paths), lambda *loads: sum(transform.thruster_load(load) for load in loads))
+
+        self.fuel_consumption = series("Cumulative fuel consumption", "kg")
+        self._fuel_flow = LatestCombination(len(self.fuel_paths), lambda *flows: sum(flows))
+        # l/h integrated over seconds to kg of diesel
+        self._fuel_consumption = CumulativeIntegral(scale=transform.DENCITY_DIESEL * 0.001 / 3600)
+
+        self.engines = {}
+        self._thermal_efficiency = {}
+        for load_path in self.load_paths:
+            engine = Path(load_path).parent.name
+            fuel_path = next((path for path in self.fuel_paths if Path(path).parent.name == engine), None)
+            if fuel_path is None:
+                continue
+            self.engines[engine] = (load_path, fuel_path)
+            self._thermal_efficiency[engine] = (
+                series(f"{engine} thermal efficiency", "%"),
+                LatestCombination(2, transform.engine_thermal_efficiency_from_fuel_flow),
+            )
+
+    def update(self, batches: dict) -> int:
+        # batches maps a source to (time_stamps, values, unit), sources without new samples may be left out
+        empty = (np.array([], dtype='datetime64[ns]'), np.array([], dtype=float), None)
+        new = {}
+        for source in self.sources:
+            time_stamps, values, unit = batches.get(source, empty)
+            signal = self.signals[source]
+            signal.unit = signal.unit or unit
+            signal.extend(time_stamps, values)
+            new[source] = (time_stamps, values)
+
+        if self.thruster_paths:
+            self.thrusters_power.extend(*self._thrusters_power.update([new[path] for path in self.thruster_paths]))
+        if self.fuel_paths:
+            time_stamps, fuel_flow = self._fuel_flow.update([new[path] for path in self.fuel_paths])
+            self.fuel_consumption.extend(time_stamps, self._fuel_consumption.update(time_stamps, fuel_flow))
+        for engine, (load_path, fuel_path) in self.engines.items():
+            efficiency, combination = self._thermal_efficiency[engine]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                efficiency.extend(*combination.update([new[load_path], new[fuel_path]]))
+        return sum(len(values) for _, values in new.values())
+
+    def thermal_efficiency(self, engine: str) -> GrowingSeries | RingTimeSeries:
+        return self._thermal_efficiency[engine][0]
+
+    def summary(self) -> str:
+        parts = []
+        if self.thrusters_power.length:
+            parts.append(f"thrusters {round(self.thrusters_power.values[-1] / 1000, 1)} kW")
+        if self.fuel_consumption.length:
+            parts.append(f"fuel {round(self.fuel_consumption.values[-1], 2)} kg")
+        for engine in self.engines:
+            efficiency = self.thermal_efficiency(engine)
+            if efficiency.length:
+                parts.append(f"{engine} efficiency {round(efficiency.values[-1], 1)}%")
+        return ", ".join(parts)
+
+
+class Monitor(LiveMetrics):
+    # follows the RVG_mqtt csv files while the logger is still appending to them
+    def __init__(self, directory: str = "data/gunnerus/", labeler=None, horizon: timedelta = None):
+        super().__init__(sorted(Path(directory).glob("**/*.csv")), labeler, horizon)
+        self.tails = {file_path: CsvTail(file_path) for file_path in self.sources}
+
+    def poll(self) -> int:
+        return self.update({file_path: tail.poll() for file_path, tail in self.tails.items()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="follow growing RVG_mqtt csv files and print derived figures")
+    parser.add_argument("directory", nargs="?", default="data/gunnerus/")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between polls")
+    parser.add_argument("--horizon", type=float, default=None, help="hours of history to keep, everything by default")
+    args = parser.parse_args()
+
+    horizon = None if args.horizon is None else timedelta(hours=args.horizon)
+    monitor = Monitor(args.directory, horizon=horizon)
+    while True:
+        if monitor.poll():
+            print(monitor.summary(), flush=True)
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from datetime import timedelta
+import numpy as np
+import timeseries
+
+
+class Frame:
+    # several signals sampled on one shared time axis, one row per signal
+    def __init__(self, time_stamps: np.ndarray, columns: np.ndarray, labels: list[str], units: list[str]):
+        self.time_stamps = time_stamps
+        self.columns = columns
+        self.labels = labels
+        self.units = units
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __repr__(self) -> str:
+        return f"Frame(labels={self.labels}, length={len(self.time_stamps)})"
+
+    def __getitem__(self, key: int | str) -> "timeseries.TimeSeries":
+        index = self.labels.index(key) if isinstance(key, str) else key
+        return timeseries.TimeSeries(self.time_stamps, self.columns[index], self.labels[index], self.units[index])
+
+    def series(self) -> list["timeseries.TimeSeries"]:
+        return [self[index] for index in range(len(self))]
+
+    def sum(self, label: str = None) -> "timeseries.TimeSeries":
+        if len(set(self.units)) > 1:
+            raise ValueError(f"Cannot add TimeSeries with different units: {self.units}")
+        label = label if label is not None else self.labels[0]
+        return timeseries.TimeSeries(self.time_stamps, self.columns.sum(axis=0), label, self.units[0])
+
+
+def _grid(series: list["timeseries.TimeSeries"], grid) -> np.ndarray:
+    if isinstance(grid, str) and grid == "union":
+        return np.unique(np.concatenate([ts.time_stamps for ts in series]))
+    if isinstance(grid, timeseries.TimeSeries):
+        return grid.time_stamps
+    if isinstance(grid, (timedelta, np.timedelta64)):
+        period = np.timedelta64(grid, 'ns')
+        non_empty = [ts.time_stamps for ts in series if len(ts.time_stamps)]
+        if not non_empty:
+            return np.array([], dtype='datetime64[ns]')
+        start = min(time_stamps[0] for time_stamps in non_empty)
+        end = max(time_stamps[-1] for time_stamps in non_empty)
+        return np.arange(start, end + period, period)
+    return np.asarray(grid, dtype='datetime64[ns]')
+
+
+def align(series: list["timeseries.TimeSeries"], grid="union") -> Frame:
+    # grid is "union", a TimeSeries whose index is reused, a fixed sampling period or explicit time stamps
+    series = list(series)
+    if not series:
+        raise ValueError("cannot align an empty list of TimeSeries")
+    time_stamps = _grid(series, grid)
+
+    # nanoseconds relative to the first sample keep sub-second precision in float64
+    origin = time_stamps[0] if len(time_stamps) else np.datetime64(0, 'ns')
+    x = (time_stamps - origin).astype(np.int64).astype(np.float64)
+    columns = np.full((len(series), len(time_stamps)), np.nan)
+    for row, ts in enumerate(series):
+        if len(ts.time_stamps) == 0:
+            continue
+        xp = (ts.time_stamps - origin).astype(np.int64).astype(np.float64)
+        columns[row] = np.interp(x, xp, ts.values)
+
+    return Frame(time_stamps, columns, [ts.label for ts in series], [ts.unit for ts in series])
@@ -0,0 +1,160 @@
+from datetime import datetime, timezone
+import numpy as np
+
+# bytes read per block when parsing RVG_mqtt csv exports
+BLOCK_SIZE = 1 << 23
+
+NEWLINE = ord("\n")
+COMMA = ord(",")
+
+# "2024-09-10T06:26:26.826584191Z"
+SEPARATORS = {4: ord("-"), 7: ord("-"), 10: ord("T"), 13: ord(":"), 16: ord(":"), 19: ord(".")}
+DIGITS = (slice(0, 4), slice(5, 7), slice(8, 10), slice(11, 13), slice(14, 16), slice(17, 19))
+
+
+def deserialize_line(line: str) -> tuple[np.datetime64, float, str]:
+    match line.split(","):
+        case [date_time_raw, value_raw, unit_raw]:
+            ts = datetime.fromisoformat(date_time_raw.strip()).astimezone(timezone.utc).replace(tzinfo=None)
+            return np.datetime64(ts, "ns"), float(value_raw.strip()), unit_raw.strip()
+        case _:
+            raise ValueError("cannot deserialize line", line)
+
+
+def _to_number(chars: np.ndarray) -> np.ndarray:
+    number = np.zeros(len(chars), dtype=np.int64)
+    for column in chars.T:
+        number = number * 10 + (column - ord("0"))
+    return number
+
+
+def _parse_fixed_width(raw: np.ndarray) -> np.ndarray | None:
+    # vectorized path for utc timestamps that all share the same width, i.e. the logger output
+    width = raw.dtype.itemsize
+    if len(raw) == 0 or width < 21:
+        return None
+    chars = raw.view(np.uint8).reshape(-1, width)
+    if not np.all(chars[:, -1] == ord("Z")):
+        return None
+    for position, separator in SEPARATORS.items():
+        if not np.all(chars[:, position] == separator):
+            return None
+    fraction = slice(20, width - 1)
+    digits = np.concatenate([chars[:, s] for s in DIGITS] + [chars[:, fraction]], axis=1)
+    if np.any((digits < ord("0")) | (digits > ord("9"))):
+        return None
+
+    year, month, day, hour, minute, second = (_to_number(chars[:, s]) for s in DIGITS)
+    if np.any((month < 1) | (month > 12)):
+        return None
+    months = (year - 1970) * 12 + month - 1
+    first_days = months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    days_in_month = (months + 1).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) - first_days
+    # out of range fields are left to the per line parser and its error, instead of rolling over into the next month
+    if np.any((day < 1) | (day > days_in_month) | (hour > 23) | (minute > 59) | (second > 59)):
+        return None
+    seconds = (first_days + day - 1) * 86400 + hour * 3600 + minute * 60 + second
+    # digits beyond nanoseconds are truncated like numpy does
+    fraction_digits = min(width - 21, 9)
+    nano_seconds = _to_number(chars[:, 20:20 + fraction_digits]) * 10**(9 - fraction_digits)
+    return (seconds * 10**9 + nano_seconds).astype("datetime64[ns]")
+
+
+def _parse_by_width(raw: np.ndarray) -> np.ndarray | None:
+    # the logger trims trailing zeros of the fraction, so timestamps come in a handful of widths
+    widths = np.char.str_len(raw)
+    unique_widths = np.unique(widths)
+    if len(unique_widths) == 1:
+        return _parse_fixed_width(raw)
+    time_stamps = np.empty(len(raw), dtype="datetime64[ns]")
+    for width in unique_widths:
+        mask = widths == width
+        parsed = _parse_fixed_width(raw[mask].astype(f"S{width}"))
+        if parsed is None:
+            return None
+        time_stamps[mask] = parsed
+    return time_stamps
+
+
+def parse_timestamps(raw: list[bytes] | np.ndarray) -> np.ndarray:
+    raw = np.asarray(raw, dtype=bytes)
+    time_stamps = _parse_by_width(raw)
+    if time_stamps is not None:
+        return time_stamps
+
+    stripped = [stamp.strip().decode() for stamp in raw.tolist()]
+    if all(stamp.endswith("Z") for stamp in stripped):
+        return np.array([stamp[:-1] for stamp in stripped], dtype="datetime64[ns]")
+    if all(stamp.endswith("+00:00") for stamp in stripped):
+        return np.array([stamp[:-6] for stamp in stripped], dtype="datetime64[ns]")
+    return np.array([datetime.fromisoformat(stamp).astimezone(timezone.utc).replace(tzinfo=None)
+                     for stamp in stripped], dtype="datetime64[ns]")
+
+
+def _raise_on_invalid_line(data: bytes) -> None:
+    for line in data.decode().splitlines(keepends=True):
+        deserialize_line(line)
+    raise ValueError("cannot deserialize block", data[:100])
+
+
+def parse_block(data: bytes) -> tuple[np.ndarray, np.ndarray, str | None]:
+    # data holds complete "timestamp,value,unit" lines terminated by a newline
+    data = data.replace(b"\r\n", b"\n")
+    if not data:
+        return np.array([], dtype="datetime64[ns]"), np.array([], dtype=float), None
+
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    line_ends = np.flatnonzero(buffer == NEWLINE)
+    commas_before_line_end = np.searchsorted(np.flatnonzero(buffer == COMMA), line_ends)
+    if not np.array_equal(commas_before_line_end, np.arange(2, 2 * len(line_ends) + 1, 2)):
+        _raise_on_invalid_line(data)
+
+    first_line = data[:line_ends[0]]
+    unit = first_line.rsplit(b",", 1)[1]
+    suffix = b"," + unit + b"\n"
+    try:
+        if data.count(suffix) == len(line_ends):
+            # unit never changes within the block => only two columns to split
+            fields = data[:-len(suffix)].replace(suffix, b",").split(b",")
+            time_stamps, values = fields[0::2], fields[1::2]
+        else:
+            fields = data[:-1].replace(b"\n", b",").split(b",")
+            time_stamps, values = fields[0::3], fields[1::3]
+        return parse_timestamps(time_stamps), np.array(values).astype(np.float64), unit.strip().decode()
+    except ValueError:
+        _raise_on_invalid_line(data)
+
+
+def iter_blocks(file, block_size: int = BLOCK_SIZE):
+    remainder = b""
+    while chunk := file.read(block_size):
+        chunk = remainder + chunk
+        end = chunk.rfind(b"\n") + 1
+        remainder = chunk[end:]
+        if end:
+            yield chunk[:end]
+    if remainder:
+        yield remainder + b"\n"
+
+
+def read_unit(file_path: str) -> str | None:
+    # the unit of the first line, without parsing the rest of the file
+    with open(file_path, "rb") as file:
+        line = file.readline().strip()
+    return line.rsplit(b",", 1)[1].strip().decode() if line.count(b",") == 2 else None
+
+
+def read_csv(file_path: str, block_size: int = BLOCK_SIZE) -> tuple[np.ndarray, np.ndarray, str | None]:
+    unit = None
+    time_stamps = []
+    values = []
+    with open(file_path, "rb") as file:
+        for block in iter_blocks(file, block_size):
+            block_time_stamps, block_values, block_unit = parse_block(block)
+            unit = unit if unit is not None else block_unit
+            time_stamps.append(block_time_stamps)
+            values.append(block_values)
+
+    if not time_stamps:
+        return np.array([], dtype="datetime64[ns]"), np.array([], dtype=float), None
+    return np.concatenate(time_stamps), np.concatenate(values), unit
@@ -0,0 +1,174 @@
+from collections import defaultdict
+from pathlib import Path
+import argparse
+import atexit
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+# tracing is off unless TIMESERIES_TRACE names a json lines file, every process of a run appends its spans to it
+TRACE_FILE = os.environ.get("TIMESERIES_TRACE")
+# peak memory per span needs tracemalloc, which slows python allocations down noticeably
+TRACE_MEMORY = os.environ.get("TIMESERIES_TRACE_MEMORY", "on") == "on"
+
+ENABLED = False
+_file = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class _NoSpan:
+    # shared by every span while tracing is off, entering it and setting samples costs next to nothing
+    samples = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Span:
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+        self.samples = None
+        self.child_peak = 0
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self)
+        if TRACE_MEMORY:
+            current, peak = tracemalloc.get_traced_memory()
+            # the peak is reset for this span, the outer span keeps what it has seen so far
+            if self.parent is not None:
+                self.parent.child_peak = max(self.parent.child_peak, peak)
+            tracemalloc.reset_peak()
+            self.start_memory = current
+        self.start = time.time()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.process_time() - self.start_cpu
+        _stack().pop()
+        record = {"name": self.name, "start": self.start, "wall": wall, "cpu": cpu, "samples": self.samples,
+                  "pid": os.getpid(), "tid": threading.get_ident(),
+                  "parent": None if self.parent is None else self.parent.name}
+        if TRACE_MEMORY:
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self.child_peak)
+            # peak allocated on top of what was allocated when the span started
+            record["peak_bytes"] = max(0, peak - self.start_memory)
+            if self.parent is not None:
+                self.parent.child_peak = max(self.parent.child_peak, peak)
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self.args:
+            record["args"] = self.args
+        _write(record)
+        return False
+
+
+def _stack() -> list[Span]:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _write(record: dict) -> None:
+    line = json.dumps(record, default=str) + "\n"
+    with _lock:
+        # line buffered appends, pool workers are ended without running atexit handlers
+        _file.write(line)
+
+
+def span(name: str, **args):
+    # with instrument.span("timeseries.from_csv", file=file_path) as s: ... s.samples = len(values)
+    if not ENABLED:
+        return _NO_SPAN
+    return Span(name, args)
+
+
+def enable(file_path, memory: bool = None, truncate: bool = False) -> None:
+    # the environment is updated as well, so worker processes started afterwards trace into the same file
+    global ENABLED, TRACE_FILE, TRACE_MEMORY, _file
+    disable()
+    TRACE_FILE = str(file_path)
+    TRACE_MEMORY = TRACE_MEMORY if memory is None else memory
+    os.environ["TIMESERIES_TRACE"] = TRACE_FILE
+    os.environ["TIMESERIES_TRACE_MEMORY"] = "on" if TRACE_MEMORY else "off"
+    Path(TRACE_FILE).parent.mkdir(parents=True, exist_ok=True)
+    _file = open(TRACE_FILE, "w" if truncate else "a", buffering=1)
+    if TRACE_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    ENABLED = True
+
+
+def disable() -> None:
+    global ENABLED, _file
+    ENABLED = False
+    if _file is not None:
+        _file.close()
+        _file = None
+
+
+def read_trace(file_path) -> list[dict]:
+    with open(file_path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def to_chrome_trace(records: list[dict]) -> dict:
+    # complete events for chrome://tracing and https://ui.perfetto.dev, times in microseconds
+    events = []
+    for record in records:
+        args = {key: record[key] for key in ("cpu", "samples", "peak_bytes", "error") if record.get(key) is not None}
+        args.update(record.get("args", {}))
+        events.append({"name": record["name"], "cat": record["name"].split(".")[0], "ph": "X",
+                       "ts": record["start"] * 1e6, "dur": record["wall"] * 1e6,
+                       "pid": record["pid"], "tid": record["tid"], "args": args})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def summary(records: list[dict]) -> list[tuple]:
+    # (name, calls, wall, cpu, samples, largest peak) per span name, most wall time first
+    totals = defaultdict(lambda: [0, 0.0, 0.0, 0, 0])
+    for record in records:
+        total = totals[record["name"]]
+        total[0] += 1
+        total[1] += record["wall"]
+        total[2] += record["cpu"]
+        total[3] += record.get("samples") or 0
+        total[4] = max(total[4], record.get("peak_bytes") or 0)
+    return sorted(((name, *total) for name, total in totals.items()), key=lambda row: -row[2])
+
+
+if TRACE_FILE:
+    enable(TRACE_FILE)
+atexit.register(disable)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="summarise a trace written with TIMESERIES_TRACE")
+    parser.add_argument("trace", nargs="?", default="trace.jsonl")
+    parser.add_argument("--chrome", default=None, help="also write it in the chrome trace event format")
+    args = parser.parse_args()
+
+    records = read_trace(args.trace)
+    if args.chrome:
+        Path(args.chrome).write_text(json.dumps(to_chrome_trace(records)))
+    print(f"{'span':40} {'calls':>7} {'wall s':>9} {'cpu s':>9} {'samples':>12} {'peak MiB':>9}")
+    for name, calls, wall, cpu, samples, peak in summary(records):
+        print(f"{name:40} {calls:7} {wall:9.3f} {cpu:9.3f} {samples:12} {peak / 2**20:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
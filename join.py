@@ -0,0 +1,73 @@
+from datetime import timedelta
+import numpy as np
+from frame import Frame
+from timeseries import TimeSeries
+from ais import Track
+
+DIRECTIONS = ("backward", "forward", "nearest")
+
+
+def asof_indices(time_stamps: np.ndarray, other_time_stamps: np.ndarray, tolerance: timedelta | None = None,
+                 direction: str = "backward") -> np.ndarray:
+    # for every time stamp the index of the matching sorted other time stamp, -1 when there is none within tolerance.
+    # backward takes the latest sample at or before, forward the first at or after, nearest the closest of both
+    if direction not in DIRECTIONS:
+        raise ValueError(f"unknown as-of direction {direction}, expected one of {DIRECTIONS}")
+    time_stamps = np.asarray(time_stamps, dtype='datetime64[ns]')
+    other_time_stamps = np.asarray(other_time_stamps, dtype='datetime64[ns]')
+    if len(other_time_stamps) == 0:
+        return np.full(len(time_stamps), -1, dtype=np.int64)
+
+    before = np.searchsorted(other_time_stamps, time_stamps, side="right") - 1
+    after = np.searchsorted(other_time_stamps, time_stamps, side="left")
+    before_valid = before >= 0
+    after_valid = after < len(other_time_stamps)
+    before_gap = np.where(before_valid, time_stamps - other_time_stamps[np.clip(before, 0, None)], np.timedelta64(-1, 'ns'))
+    after_gap = np.where(after_valid, other_time_stamps[np.clip(after, None, len(other_time_stamps) - 1)] - time_stamps,
+                         np.timedelta64(-1, 'ns'))
+
+    match direction:
+        case "backward":
+            indices, gaps, valid = before, before_gap, before_valid
+        case "forward":
+            indices, gaps, valid = after, after_gap, after_valid
+        case "nearest":
+            use_after = after_valid & (~before_valid | (after_gap < before_gap))
+            indices = np.where(use_after, after, before)
+            gaps = np.where(use_after, after_gap, before_gap)
+            valid = before_valid | after_valid
+
+    if tolerance is not None:
+        valid = valid & (gaps <= np.timedelta64(tolerance, 'ns'))
+    return np.where(valid, indices, -1).astype(np.int64)
+
+
+def _take(values: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    return np.where(indices >= 0, values[np.clip(indices, 0, None)], np.nan) if len(values) else np.full(len(indices), np.nan)
+
+
+def asof(time_stamps: np.ndarray, series: list[TimeSeries], tolerance: timedelta | None = None,
+         direction: str = "backward") -> Frame:
+    # every series sampled at time_stamps without interpolation, NaN where nothing matched within tolerance.
+    # only sorted searches on the inputs, no union time axis is built
+    time_stamps = np.asarray(time_stamps, dtype='datetime64[ns]')
+    columns = np.full((len(series), len(time_stamps)), np.nan)
+    for row, ts in enumerate(series):
+        columns[row] = _take(ts.values, asof_indices(time_stamps, ts.time_stamps, tolerance, direction))
+    return Frame(time_stamps, columns, [ts.label for ts in series], [ts.unit for ts in series])
+
+
+def telemetry_at_fixes(track: Track, series: list[TimeSeries], tolerance: timedelta | None = timedelta(seconds=10),
+                       direction: str = "backward") -> Frame:
+    # e.g. dataset.select(f.is_engine_fuel_consumption, route) at every AIS fix of the route
+    return asof(track.time_stamps, series, tolerance, direction)
+
+
+def positions_at(ts: TimeSeries, track: Track, tolerance: timedelta | None = timedelta(seconds=30),
+                 direction: str = "nearest", columns: tuple[str, ...] = ("latitude", "longitude", "sog")) -> Frame:
+    # the AIS fix of track closest to every sample of ts, one row per track column
+    indices = asof_indices(ts.time_stamps, track.time_stamps, tolerance, direction)
+    values = np.array([_take(track.columns[column], indices) for column in columns]).reshape(len(columns), len(indices))
+    units = ["°" if column in ("latitude", "longitude", "cog", "heading") else "kn" if column == "sog" else None
+             for column in columns]
+    return Frame(ts.time_stamps, values, list(columns), units)
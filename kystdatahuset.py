@@ -0,0 +1,177 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+
+BASE_URL = os.environ.get("KYSTDATAHUSET_URL", "https://kystdatahuset.no/ws/")
+LOGIN_PATH = "api/auth/login"
+POSITIONS_PATH = "api/ais/positions/for-mmsis-time"
+CACHE_DIRECTORY = Path(os.environ.get("KYSTDATAHUSET_CACHE_DIR", ".cache/kystdatahuset"))
+
+# the api limits the time span of a single request, longer ranges are split into pages of this length
+PAGE_LENGTH = timedelta(days=1)
+# the token is renewed a bit before this and whenever the api answers 401
+TOKEN_LIFETIME = timedelta(minutes=50)
+TIME_FORMAT = "%Y%m%d%H%M"
+
+
+class KystdatahusetError(Exception):
+    pass
+
+
+class Client:
+    # pooled keep alive connections, a shared JWT and an on disk cache of every answered query
+    def __init__(self, username: str = None, password: str = None, base_url: str = BASE_URL, max_workers: int = 4,
+                 cache_directory: str | Path | None = CACHE_DIRECTORY, timeout: float = 60.0):
+        self.username = username or os.environ.get("KYSTDATAHUSET_USERNAME")
+        self.password = password or os.environ.get("KYSTDATAHUSET_PASSWORD")
+        url = urlsplit(base_url if base_url.endswith("/") else base_url + "/")
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port
+        self.prefix = url.path
+        self.max_workers = max_workers
+        self.cache_directory = None if cache_directory is None else Path(cache_directory)
+        self.timeout = timeout
+        self._connections = queue.LifoQueue()
+        self._token = None
+        self._token_expiry = 0.0
+        self._token_lock = threading.Lock()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        connection_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def close(self) -> None:
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _request(self, path: str, body: dict, token: str = None) -> tuple[int, bytes]:
+        try:
+            connection = self._connections.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if token is not None:
+            headers["Authorization"] = f"Bearer {token}"
+        try:
+            connection.request("POST", self.prefix + path, json.dumps(body), headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            # the server may have closed an idle keep alive connection, retry once on a fresh one
+            connection.close()
+            connection = self._connect()
+            connection.request("POST", self.prefix + path, json.dumps(body), headers)
+            response = connection.getresponse()
+            data = response.read()
+        if response.will_close:
+            connection.close()
+        else:
+            self._connections.put(connection)
+        return response.status, data
+
+    def token(self, refresh: bool = False) -> str:
+        with self._token_lock:
+            if refresh or self._token is None or time.monotonic() >= self._token_expiry:
+                if not self.username or not self.password:
+                    raise KystdatahusetError("set KYSTDATAHUSET_USERNAME and KYSTDATAHUSET_PASSWORD, see .env.example")
+                status, data = self._request(LOGIN_PATH, {"username": self.username, "password": self.password})
+                if status != 200:
+                    raise KystdatahusetError(f"login failed with status {status}: {data[:200]!r}")
+                self._token = json.loads(data)["data"]["JWT"]
+                self._token_expiry = time.monotonic() + TOKEN_LIFETIME.total_seconds()
+            return self._token
+
+    def _cache_path(self, path: str, body: dict) -> Path:
+        key = hashlib.sha1(json.dumps([self.host, self.prefix + path, body], sort_keys=True).encode()).hexdigest()
+        return self.cache_directory / f"{key}.json"
+
+    def post(self, path: str, body: dict) -> list[dict]:
+        cache_path = None if self.cache_directory is None else self._cache_path(path, body)
+        if cache_path is not None and cache_path.exists():
+            return json.loads(cache_path.read_text())
+
+        status, data = self._request(path, body, self.token())
+        if status == 401:
+            status, data = self._request(path, body, self.token(refresh=True))
+        if status != 200:
+            raise KystdatahusetError(f"{path} failed with status {status}: {data[:200]!r}")
+        answer = json.loads(data)
+        records = answer["data"] if isinstance(answer, dict) else answer
+
+        if cache_path is not None:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = cache_path.with_name(f"{cache_path.name}.tmp{os.getpid()}.{threading.get_ident()}")
+            temporary.write_text(json.dumps(records))
+            os.replace(temporary, cache_path)
+        return records
+
+    def positions(self, mmsi: int, date_time_start: datetime, date_time_end: datetime) -> list[dict]:
+        return self.post(POSITIONS_PATH, {
+            "mmsiIds": [mmsi],
+            "start": date_time_start.astimezone(timezone.utc).strftime(TIME_FORMAT),
+            "end": date_time_end.astimezone(timezone.utc).strftime(TIME_FORMAT),
+        })
+
+    def fetch_positions(self, mmsis: list[int], date_time_start: datetime, date_time_end: datetime) -> list[dict]:
+        # every (mmsi, page) is one request, at most max_workers of them are in flight
+        pages = []
+        page_start = date_time_start
+        while page_start < date_time_end:
+            page_end = min(page_start + PAGE_LENGTH, date_time_end)
+            pages.append((page_start, page_end))
+            page_start = page_end
+        queries = [(mmsi, start, end) for mmsi in mmsis for start, end in pages]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            answers = list(executor.map(lambda query: self.positions(*query), queries))
+        records = [record for answer in answers for record in answer]
+        # neighbouring pages share their boundary minute, only exact repeats are dropped
+        unique = {json.dumps(record, sort_keys=True): record for record in records}
+        return sorted(unique.values(), key=lambda record: (record.get("date_time_utc"), record.get("mmsi")))
+
+    def download_positions(self, file_path, mmsis: list[int], date_time_start: datetime, date_time_end: datetime) -> int:
+        # the same shape as data/gunnerus_position_10_09_2024.json, ready for position.py and ais.read_json
+        records = self.fetch_positions(mmsis, date_time_start, date_time_end)
+        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, "w") as file:
+            json.dump(records, file, indent=2)
+        return len(records)
+
+
+def parse_date_time(value: str) -> datetime:
+    date_time = datetime.fromisoformat(value)
+    return date_time if date_time.tzinfo is not None else date_time.replace(tzinfo=timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="download AIS positions from Kystdatahuset")
+    parser.add_argument("mmsis", type=int, nargs="+")
+    parser.add_argument("--start", type=parse_date_time, required=True, help="utc unless an offset is given")
+    parser.add_argument("--end", type=parse_date_time, required=True)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--base-url", default=BASE_URL)
+    args = parser.parse_args()
+
+    with Client(base_url=args.base_url, max_workers=args.workers) as client:
+        count = client.download_positions(args.output, args.mmsis, args.start, args.end)
+    print(f"wrote {count} positions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
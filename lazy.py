@@ -0,0 +1,220 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+import numpy as np
+import frame
+import timeseries
+import transform
+
+
+class Expression(ABC):
+    # deferred TimeSeries arithmetic, nothing is loaded or interpolated before evaluate()
+    label = None
+    unit = None
+
+    def children(self) -> tuple["Expression", ...]:
+        return ()
+
+    def leaves(self) -> list["Leaf"]:
+        leaves = {}
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Leaf):
+                leaves[id(node)] = node
+            stack.extend(node.children())
+        return list(leaves.values())
+
+    def __add__(self, other) -> "Expression":
+        return BinaryOperation(np.add, "add", self, as_expression(other))
+
+    def __radd__(self, other) -> "Expression":
+        # sum() starts from 0
+        if isinstance(other, (int, float)) and other == 0:
+            return self
+        return BinaryOperation(np.add, "add", as_expression(other), self)
+
+    def __sub__(self, other) -> "Expression":
+        return BinaryOperation(np.subtract, "subtract", self, as_expression(other))
+
+    def __rsub__(self, other) -> "Expression":
+        return BinaryOperation(np.subtract, "subtract", as_expression(other), self)
+
+    def transform(self, transformer, new_unit: str, other=None) -> "Expression":
+        operands = (self,) if other is None else (self, as_expression(other))
+        return Transform(transformer, new_unit, operands)
+
+    @abstractmethod
+    def with_children(self, children: tuple["Expression", ...]) -> "Expression":
+        pass
+
+    def filter_date(self, date_time_start: datetime, date_time_end: datetime) -> "Expression":
+        # the window is pushed down to every leaf, so only the requested samples are ever loaded and interpolated.
+        # the tree is copied, leaves shared with other expressions keep their own window
+        copies = {}
+
+        def restrict(node: Expression) -> Expression:
+            if id(node) not in copies:
+                if isinstance(node, Leaf):
+                    copies[id(node)] = node.restrict(date_time_start, date_time_end)
+                else:
+                    copies[id(node)] = node.with_children(tuple(restrict(child) for child in node.children()))
+            return copies[id(node)]
+        return restrict(self)
+
+    def evaluate(self) -> "timeseries.TimeSeries":
+        return Evaluation(self).run()
+
+
+class Leaf(Expression):
+    def __init__(self, source, label: str = None, unit: str = None, window: tuple = (None, None)):
+        # source is a TimeSeries or a callable returning one, e.g. a Dataset loader. a loader only knows the unit
+        # once it has run, so the caller passes it in
+        self.source = source
+        self.label = label if label is not None else getattr(source, "label", None)
+        self.unit = unit if unit is not None else getattr(source, "unit", None)
+        self.window = window
+
+    def restrict(self, date_time_start: datetime, date_time_end: datetime) -> "Leaf":
+        start, end = self.window
+        if date_time_start is not None:
+            start = date_time_start if start is None else max(start, date_time_start)
+        if date_time_end is not None:
+            end = date_time_end if end is None else min(end, date_time_end)
+        return Leaf(self.source, self.label, self.unit, (start, end))
+
+    def with_children(self, children: tuple[Expression, ...]) -> Expression:
+        return self
+
+    def load(self) -> "timeseries.TimeSeries":
+        ts = self.source() if callable(self.source) else self.source
+        return ts.filter_date(*self.window)
+
+    def __repr__(self) -> str:
+        return f"Leaf(label={self.label}, unit={self.unit})"
+
+
+class Transform(Expression):
+    def __init__(self, transformer, unit: str, operands: tuple[Expression, ...]):
+        self.transformer = transformer
+        self.operands = operands
+        self.unit = unit
+
+    @property
+    def label(self) -> str:
+        return self.operands[0].label
+
+    def children(self) -> tuple[Expression, ...]:
+        return self.operands
+
+    def with_children(self, children: tuple[Expression, ...]) -> Expression:
+        return Transform(self.transformer, self.unit, children)
+
+    def __repr__(self) -> str:
+        return f"Transform({getattr(self.transformer, '__name__', self.transformer)}, {', '.join(map(repr, self.operands))})"
+
+
+class BinaryOperation(Expression):
+    def __init__(self, operator, name: str, left: Expression, right: Expression):
+        if left.unit is not None and right.unit is not None and left.unit != right.unit:
+            raise ValueError(f"Cannot {name} TimeSeries with different units: {left.unit} and {right.unit}")
+        self.operator = operator
+        self.name = name
+        self.left = left
+        self.right = right
+
+    @property
+    def label(self) -> str:
+        return self.left.label
+
+    @property
+    def unit(self) -> str:
+        return self.left.unit if self.left.unit is not None else self.right.unit
+
+    def children(self) -> tuple[Expression, ...]:
+        return self.left, self.right
+
+    def with_children(self, children: tuple[Expression, ...]) -> Expression:
+        return BinaryOperation(self.operator, self.name, *children)
+
+    def __repr__(self) -> str:
+        return f"{self.name}({self.left!r}, {self.right!r})"
+
+
+def as_expression(value) -> Expression:
+    if isinstance(value, Expression):
+        return value
+    if isinstance(value, timeseries.TimeSeries):
+        return Leaf(value)
+    raise TypeError(f"cannot use {type(value).__name__} in a TimeSeries expression")
+
+
+class Evaluation:
+    def __init__(self, root: Expression):
+        self.root = root
+        self.loaded = {}
+        self.sources = {}
+
+    def _sources(self, node: Expression) -> frozenset[int]:
+        if id(node) not in self.sources:
+            if isinstance(node, Leaf):
+                self.sources[id(node)] = frozenset([id(node)])
+            else:
+                self.sources[id(node)] = frozenset().union(*(self._sources(child) for child in node.children()))
+        return self.sources[id(node)]
+
+    def _load(self, leaf: Leaf) -> "timeseries.TimeSeries":
+        if id(leaf) not in self.loaded:
+            self.loaded[id(leaf)] = leaf.load()
+        return self.loaded[id(leaf)]
+
+    def _native(self, node: Expression) -> np.ndarray:
+        # a subtree over a single signal is evaluated on that signal's own samples, exactly like the eager api
+        if isinstance(node, Leaf):
+            return self._load(node).values
+        if isinstance(node, Transform):
+            return transform.apply(node.transformer, *(self._native(operand) for operand in node.operands))
+        return node.operator(self._native(node.left), self._native(node.right))
+
+    def _columns(self, node: Expression, columns: dict) -> None:
+        if len(self._sources(node)) == 1:
+            if id(node) not in columns:
+                leaf = self._load(next(leaf for leaf in node.leaves()))
+                columns[id(node)] = timeseries.TimeSeries(leaf.time_stamps, self._native(node), node.label, node.unit)
+            return
+        for child in node.children():
+            self._columns(child, columns)
+
+    def _aligned(self, node: Expression, columns: dict) -> tuple[np.ndarray, bool]:
+        # returns the values and whether they are a temporary this evaluation may overwrite
+        if id(node) in columns:
+            return columns[id(node)], False
+        if isinstance(node, Transform):
+            operands = [self._aligned(operand, columns)[0] for operand in node.operands]
+            return transform.apply(node.transformer, *operands), True
+        left, left_owned = self._aligned(node.left, columns)
+        right, right_owned = self._aligned(node.right, columns)
+        if left_owned:
+            return node.operator(left, right, out=left), True
+        if right_owned:
+            return node.operator(left, right, out=right), True
+        return node.operator(left, right), True
+
+    def _check_units(self, node: Expression) -> None:
+        for child in node.children():
+            self._check_units(child)
+        if isinstance(node, BinaryOperation) and node.left.unit != node.right.unit:
+            raise ValueError(f"Cannot {node.name} TimeSeries with different units: {node.left.unit} and {node.right.unit}")
+
+    def run(self) -> "timeseries.TimeSeries":
+        columns = {}
+        self._columns(self.root, columns)
+        self._check_units(self.root)
+        if id(self.root) in columns:
+            return columns[id(self.root)]
+
+        # a single alignment for every signal in the expression
+        keys = list(columns)
+        aligned = frame.align([columns[key] for key in keys])
+        aligned_columns = {key: aligned.columns[row] for row, key in enumerate(keys)}
+        values, _ = self._aligned(self.root, aligned_columns)
+        return timeseries.TimeSeries(aligned.time_stamps, values, self.root.label, self.root.unit)
@@ -1,36 +1,39 @@
 from scipy.signal import butter, filtfilt
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from itertools import accumulate
+import argparse
+import numpy as np
 import matplotlib.pyplot as plt
 import filter as f
 from timeseries import TimeSeries
+from dataset import Dataset
+from frame import align
+from energy import EnergyChain
 import transform
 import os
 import routes
+import segmentation
+import instrument
 
 extension = ".png"
 
 
-def difference_engine_load(title, route, file_paths):
+def difference_engine_load(title, route, energy_chain):
 
-    file_paths_engines = filter_array(file_paths, f.is_engine_load)
-    ts_engine_emperical = sum([TimeSeries.from_csv(fp, construct_label(fp)) for fp in file_paths_engines])
-    ts_engine_theoretical = get_theoretical_engine_power(title, route, file_paths)
-
-    ts_engine_emperical = filter_date_time(ts_engine_emperical, route)
-    ts_engine_theoretical = filter_date_time(ts_engine_theoretical, route)
+    ts_engine_emperical = align(energy_chain.dataset.select(f.is_engine_load, route)).sum()
+    ts_engine_theoretical = energy_chain.get("engines_power", route)
 
     ts_engine_emperical.interpolate(ts_engine_theoretical)
 
     ts_engine_emperical.unit = "kW"
-    ts_engine_theoretical.unit = "kW"
-    ts_engine_theoretical.values = [value/1000 for value in ts_engine_theoretical.values]
+    ts_engine_theoretical = ts_engine_theoretical.transform(transform.to_kilo, "kW")
 
     ts_engine_difference = ts_engine_emperical - ts_engine_theoretical
 
-    mean_difference = sum(ts_engine_difference.values) / len(ts_engine_difference.values)
-    mean_theoretical = sum(ts_engine_theoretical.values) / len(ts_engine_theoretical.values)
-    mean_emperical = sum(ts_engine_emperical.values) / len(ts_engine_emperical.values)
+    mean_difference = ts_engine_difference.values.mean()
+    mean_theoretical = ts_engine_theoretical.values.mean()
+    mean_emperical = ts_engine_emperical.values.mean()
 
     ts_engine_difference.label = f"Engine load difference. mean: {round(mean_difference, 2)} kW"
     ts_engine_emperical.label = f"Engine load emperical. mean: {round(mean_emperical, 2)} kW"
@@ -44,78 +47,16 @@ def difference_engine_load(title, route, file_paths):
     plt.close()
 
 
-def get_theoretical_engine_power(title, route, file_paths):
-    file_paths_thruster_load = filter_array(file_paths, f.is_thruster_load)
-
-    ts_thrusters_percent = [TimeSeries.from_csv(
-        file_path, label=construct_label(file_path)) for file_path in file_paths_thruster_load]
-
-    ts_thrusters_percent = [filter_date_time(ts, route) for ts in ts_thrusters_percent]
-
-    ts_thrusters_power = sum([ts.transform(transform.thruster_load, "W") for ts in ts_thrusters_percent])
-
-    new_values = []
-    efficiency_switchboard = 0.99
-    efficiency_frequency_converter = 0.97
-    efficiency_generator = 0.96
-    for thrust in ts_thrusters_power.values:
-        new_values.append(thrust / (efficiency_frequency_converter * efficiency_switchboard * efficiency_generator))
-
-    engine_power = TimeSeries(ts_thrusters_power.time_stamps, new_values, "theoretical thermal efficiency", "")
-
-    engine_load = engine_power.transform(transform.engine_power_to_total_load, "%")
-    engine_efficiency = engine_load.transform(transform.engine_efficiency_emperical, "%")
-    engine_efficiency = engine_efficiency.transform(transform.from_percent_to_fraction, "")
-
-    time_diffs = ts_thrusters_power.get_time_diff()
-
-    electrical_eff = 0.922
-
-    time_stamps = ts_thrusters_power.time_stamps
-    ts_thrusters_power.label = "Thrusters power"
-
-    engines_power_values = []
-    efficiency_switchboard = 0.99
-    efficiency_frequency_converter = 0.97
-    efficiency_generator = 0.96
-
-    for value in ts_thrusters_power.values:
-        engines_power_values.append(value / (efficiency_frequency_converter *
-                                             efficiency_switchboard * efficiency_generator))
-
-    ts_engines_power = TimeSeries(
-        time_stamps, engines_power_values, "Theoretical power engines", "W")
-    ts_engines_load = ts_engines_power.transform(transform.engine_power_to_total_load, "%")
-    ts_engines_efficiency = ts_engines_load.transform(transform.engine_efficiency_emperical, "")
-    ts_engines_efficiency.label = "Theoretical eninges efficiency"
-    return ts_engines_power
-
-
 def get_new_plot():
     return plt.subplots(figsize=(12, 6), dpi=300)
 
 
 def save_plot(figure, title, route):
-    figure.tight_layout()
-    try:
-        os.mkdir(f"plots/{route[0]}/")
-    except FileExistsError:
-        pass
-    figure.savefig(f"plots/{route[0]}/{title}{extension}")
-
-
-def filter_array(array, filter_func):
-    return [element for element in array if filter_func(element)]
-
-
-def filter_date_time(time_series, route):
-    date_time_start = route[1]
-    date_time_end = route[2]
-    if date_time_start is not None and date_time_end is not None:
-        if time_series is list:
-            return [ts.filter_date(date_time_start, date_time_end) for ts in time_series]
-        else:
-            return time_series.filter_date(date_time_start, date_time_end)
+    with instrument.span("main.render", title=title, route=route[0]):
+        figure.tight_layout()
+        # parallel workers may create the same route directory at the same time
+        os.makedirs(f"plots/{route[0]}/", exist_ok=True)
+        figure.savefig(f"plots/{route[0]}/{title}{extension}")
 
 
 def get_engine_label(index: int, source: str) -> str:
@@ -166,33 +107,22 @@ def construct_label(file_path: str) -> str:
             raise NotImplementedError(f"{top_level}")
 
 
-def theoretical_total_power_engines(title, route, file_paths):
-    file_paths_engine_load = filter_array(file_paths, f.is_engine_load)
-    file_paths_engine_fuel_consumption = filter_array(file_paths, f.is_engine_fuel_consumption)
+def theoretical_total_power_engines(title, route, dataset):
     # this is in KW
-    time_series_engine_load = [TimeSeries.from_csv(file_path, label=construct_label(file_path))
-                               for file_path in file_paths_engine_load]
+    time_series_engine_load = dataset.select(f.is_engine_load, route)
     # this is in liters per hour
-    time_series_fuel_consumption = [TimeSeries.from_csv(file_path, label=construct_label(file_path))
-                                    for file_path in file_paths_engine_fuel_consumption]
-
-    time_series_engine_load = [filter_date_time(ts, route) for ts in time_series_engine_load]
-    time_series_fuel_consumption = [filter_date_time(ts, route) for ts in time_series_fuel_consumption]
+    time_series_fuel_consumption = dataset.select(f.is_engine_fuel_consumption, route)
 
     # interpolate
     for ts_load, ts_engine in zip(time_series_engine_load, time_series_fuel_consumption):
         ts_load.interpolate(ts_engine)
         ts_engine.interpolate(ts_load)
 
-    for ts_load, ts_fuel in zip(time_series_engine_load, time_series_fuel_consumption):
-        new_values = []
-        for value_load, value_fuel in zip(ts_load.values, ts_fuel.values):
-            new_values.append(value_load / value_fuel * 3600 / (820 * 45.4) * 100)
-        ts_load.values = new_values
-        ts_load.label = "Engine thermal efficiency " + ts_load.label[7]
-        ts_load.unit = "%"
-
-    time_series_thermal_efficiency = time_series_engine_load
+    time_series_thermal_efficiency = [
+        ts_load.transform(transform.engine_thermal_efficiency_from_fuel_flow, "%", ts_fuel)
+        for ts_load, ts_fuel in zip(time_series_engine_load, time_series_fuel_consumption)]
+    for ts in time_series_thermal_efficiency:
+        ts.label = "Engine thermal efficiency " + ts.label[7]
 
     figure, ax = get_new_plot()
 
@@ -203,119 +133,30 @@ def theoretical_total_power_engines(title, route, file_paths):
     plt.close()
 
 
-def theoretical_fuel_consumption(title, route, file_paths):
+def theoretical_fuel_consumption(title, route, energy_chain):
     figure, ax = get_new_plot()
 
-    file_paths_thruster_load = filter_array(file_paths, f.is_thruster_load)
-
-    ts_thrusters_percent = [TimeSeries.from_csv(
-        file_path, label=construct_label(file_path)) for file_path in file_paths_thruster_load]
-
-    ts_thrusters_percent = [filter_date_time(ts, route) for ts in ts_thrusters_percent]
-
-    ts_thrusters_power = sum([ts.transform(transform.thruster_load, "W") for ts in ts_thrusters_percent])
-
-    new_values = []
-    efficiency_switchboard = 0.99
-    efficiency_frequency_converter = 0.97
-    efficiency_generator = 0.96
-    for thrust in ts_thrusters_power.values:
-        new_values.append(thrust / (efficiency_frequency_converter * efficiency_switchboard * efficiency_generator))
-
-    engine_power = TimeSeries(ts_thrusters_power.time_stamps, new_values, "theoretical thermal efficiency", "")
-
-    engine_load = engine_power.transform(transform.engine_power_to_total_load, "%")
-    engine_efficiency = engine_load.transform(transform.engine_efficiency_emperical, "%")
-    engine_efficiency = engine_efficiency.transform(transform.from_percent_to_fraction, "")
-
-    time_diffs = ts_thrusters_power.get_time_diff()
-
-    electrical_eff = 0.922
-
-    time_stamps = ts_thrusters_power.time_stamps
-    ts_thrusters_power.label = "Thrusters power"
-
-    engines_power_values = []
-    efficiency_switchboard = 0.99
-    efficiency_frequency_converter = 0.97
-    efficiency_generator = 0.96
-
-    for value in ts_thrusters_power.values:
-        engines_power_values.append(value / (efficiency_frequency_converter *
-                                             efficiency_switchboard * efficiency_generator))
-
-    ts_engines_power = TimeSeries(
-        time_stamps, engines_power_values, "Theoretical power engines", "W")
-    ts_engines_load = ts_engines_power.transform(transform.engine_power_to_total_load, "%")
-    ts_engines_efficiency = ts_engines_load.transform(transform.engine_efficiency_emperical, "")
-    ts_engines_efficiency.label = "Theoretical eninges efficiency"
-
-    diesel_heating_value = 45.4 * 10**6
-
-    def to_energy_usage(
-            delta_time: float,
-            thrust: float,
-            electrical_efficiency: float,
-            fuel_energy_density: float,
-            efficiency: float):
-        # ints are saturated => float conversion
-        # time diff is in nano seconds
-        nominator = (10**(-9) * float(delta_time) * float(thrust))
-        denominator = (electrical_efficiency * fuel_energy_density * float(efficiency))
-        return nominator/denominator
-
-    energy_usage = [to_energy_usage(diff, thrust, electrical_eff, diesel_heating_value, eff)
-                    for diff, thrust, eff in zip(time_diffs, ts_thrusters_power.values, engine_efficiency.values)]
-    energy_usage_cumulative = list(accumulate(energy_usage))
-
-    fuel_usage = TimeSeries(ts_thrusters_power.time_stamps[:-1],
-                            energy_usage_cumulative, "Engines fuel consumption", "kg")
-
+    fuel_usage = energy_chain.get("fuel_consumption", route)
     fuel_usage.plot(ax, title, route)
 
     save_plot(figure, title, route)
     plt.close()
 
 
-def theoretical_engine_power_efficiency(title, route, file_paths):
-    file_paths_thruster_load = filter_array(file_paths, f.is_thruster_load)
+def theoretical_engine_power_efficiency(title, route, energy_chain):
+    ts_engines_efficiency = energy_chain.get("engines_efficiency", route)
 
-    ts_thrusters_load_ind = [TimeSeries.from_csv(
-        file_path, label=construct_label(file_path)) for file_path in file_paths_thruster_load]
-
-    ts_thrusters_load_ind = [filter_date_time(ts, route) for ts in ts_thrusters_load_ind]
-
-    ts_thrusters_power = sum([ts.transform(transform.thruster_load, "W") for ts in ts_thrusters_load_ind])
-
-    time_stamps = ts_thrusters_power.time_stamps
-
-    efficiency_switchboard = 0.99
-    efficiency_frequency_converter = 0.97
-    efficiency_generator = 0.96
-    efficiency_power_trail = efficiency_frequency_converter * efficiency_switchboard * efficiency_generator
-
-    engines_power_values = [power/efficiency_power_trail for power in ts_thrusters_power.values]
-    ts_engines_power = TimeSeries(time_stamps, engines_power_values, "Theoretical power engines", "W")
-
-    ts_engines_power = ts_engines_power.transform(transform.engine_power_to_total_load, "%")
-    ts_engines_power = ts_engines_power.transform(transform.engine_efficiency_emperical, "%")
-
-    mean = round(sum(ts_engines_power.values)/len(ts_engines_power.values), 2)
-    ts_engines_power.label = f"Theoretical power efficiency. mean: {mean}%"
-    ts_engines_power.unit = "%"
+    mean = round(ts_engines_efficiency.values.mean(), 2)
+    ts_engines_efficiency.label = f"Theoretical power efficiency. mean: {mean}%"
 
     figure, ax = get_new_plot()
-    ts_engines_power.plot(ax, title, route)
+    ts_engines_efficiency.plot(ax, title, route)
     save_plot(figure, title, route)
     plt.close()
 
 
-def read_and_plot(title, file_paths, filter, route, sum_plots=False, new_unit: str = None, transformer=None):
-    filtered_file_paths = filter_array(file_paths, filter)
-    time_series = [TimeSeries.from_csv(file_path, label=construct_label(file_path))
-                   for file_path in filtered_file_paths]
-
-    time_series = [filter_date_time(ts, route) for ts in time_series]
+def read_and_plot(title, dataset, filter, route, sum_plots=False, new_unit: str = None, transformer=None):
+    time_series = dataset.select(filter, route)
 
     if transformer is not None:
         time_series = [time_serie.transform(transformer, new_unit) for time_serie in time_series]
@@ -330,7 +171,7 @@ def read_and_plot(title, file_paths, filter, route, sum_plots=False, new_unit: s
         ts.plot(ax, title, route)
 
     if sum_plots:
-        summed_series = sum(time_series)
+        summed_series = align(time_series).sum()
         summed_series.label = f"total {title.lower()}"
         summed_series.plot(ax, title, route)
 
@@ -338,16 +179,10 @@ def read_and_plot(title, file_paths, filter, route, sum_plots=False, new_unit: s
     plt.close()
 
 
-def energy_efficiency_fuel_to_genset(title, route, file_paths):
-    file_paths_fuel_consumption = filter_array(file_paths, f.is_engine_fuel_consumption)
-    file_paths_engine_load = filter_array(file_paths, f.is_engine_load)
-
-    engine_ids = [f.get_engine_id(file_path) for file_path in file_paths_fuel_consumption]
-    ts_fuel_consumption_ind = [TimeSeries.from_csv(fp, construct_label(fp)) for fp in file_paths_fuel_consumption]
-    ts_engine_load_ind = [TimeSeries.from_csv(fp, construct_label(fp)) for fp in file_paths_engine_load]
-
-    ts_fuel_consumption_ind = [filter_date_time(ts, route) for ts in ts_fuel_consumption_ind]
-    ts_engine_load_ind = [filter_date_time(ts, route) for ts in ts_engine_load_ind]
+def energy_efficiency_fuel_to_genset(title, route, dataset):
+    engine_ids = [f.get_engine_id(file_path) for file_path in dataset.paths(f.is_engine_fuel_consumption)]
+    ts_fuel_consumption_ind = dataset.select(f.is_engine_fuel_consumption, route)
+    ts_engine_load_ind = dataset.select(f.is_engine_load, route)
 
     ts_fuel_consumption_ind = [ts.transform(transform.engine_fuel_consumption_liter_per_h_to_kg_per_s, "kg/s")
                                for ts in ts_fuel_consumption_ind]
@@ -365,63 +200,49 @@ def energy_efficiency_fuel_to_genset(title, route, file_paths):
         fuel.interpolate(power)
         time_stamps = fuel.time_stamps[:-1]
 
-        time_diffs_fuel = fuel.get_time_diff()
+        time_diffs_fuel = fuel.diff() * 1e-9
         fuel_values = fuel.values[:-1]
-        fuel_values = [1e-6 if val < 1e-9 else val for val in fuel_values]
-        energy_in = [1e3*diesel_heating_value * float(mass_flow_rate) * float(diff) * 10**(-9)
-                     for diff, mass_flow_rate in zip(time_diffs_fuel, fuel_values)]
+        fuel_values = np.where(fuel_values < 1e-9, 1e-6, fuel_values)
+        energy_in = 1e3 * diesel_heating_value * fuel_values * time_diffs_fuel
 
-        time_diffs_engine = power.get_time_diff()
-        engine_power_values = power.values[:-1]
-        energy_out = [float(diff)*float(engine_power) * 10**(-9)
-                      for diff, engine_power in zip(time_diffs_engine, engine_power_values)]
+        time_diffs_engine = power.diff() * 1e-9
+        energy_out = power.values[:-1] * time_diffs_engine
 
-        energy_efficiency = [e_out/e_in * 100 for e_out, e_in in zip(energy_out, energy_in)]
+        energy_efficiency = energy_out / energy_in * 100
         ts = TimeSeries(time_stamps, energy_efficiency, "Energy efficiency from fuel to generator output", "%")
 
         ts.values = low_pass_filter(ts.values, cutoff=0.6, fs=10)
-        label = f"engine {engine_id} efficiency.\nmean: {
-            round(sum(ts.values)/len(ts.values), 2)}, min: {round(min(ts.values), 2)}, max: {round(max(ts.values), 2)}\n"
+        label = (f"engine {engine_id} efficiency.\nmean: {round(ts.values.mean(), 2)}, "
+                 f"min: {round(ts.values.min(), 2)}, max: {round(ts.values.max(), 2)}\n")
         ts.plot(ax, title, route, label)
 
     save_plot(figure, title, route)
     plt.close()
 
 
-def energy_efficiency_engine_to_thruster(title, route, file_paths):
-    file_paths_fuel_consumption = filter_array(file_paths, f.is_engine_fuel_consumption)
-    file_paths_thruster_load = filter_array(file_paths, f.is_thruster_load)
-
-    ts_fuel_consumption_ind = [TimeSeries.from_csv(fp, construct_label(fp)) for fp in file_paths_fuel_consumption]
-    ts_thruster_load_ind = [TimeSeries.from_csv(fp, construct_label(fp)) for fp in file_paths_thruster_load]
-
-    ts_fuel_consumption_ind = [filter_date_time(ts, route) for ts in ts_fuel_consumption_ind]
-    ts_thruster_load_ind = [filter_date_time(ts, route) for ts in ts_thruster_load_ind]
+def energy_efficiency_engine_to_thruster(title, route, energy_chain):
+    ts_fuel_consumption_ind = energy_chain.dataset.select(f.is_engine_fuel_consumption, route)
 
     ts_fuel_consumption_ind = [ts.transform(transform.engine_fuel_consumption_liter_per_h_to_kg_per_s, "kg/s")
                                for ts in ts_fuel_consumption_ind]
-    ts_thruster_power_ind = [ts.transform(transform.thruster_load, "W") for ts in ts_thruster_load_ind]
 
-    ts_fuel_consumption = sum(ts_fuel_consumption_ind)
-    ts_thruster_power = sum(ts_thruster_power_ind)
+    ts_fuel_consumption = align(ts_fuel_consumption_ind).sum()
+    ts_thruster_power = energy_chain.get("thrusters_power", route)
 
     ts_fuel_consumption.interpolate(ts_thruster_power)
     time_stamps = ts_fuel_consumption.time_stamps[:-1]
 
     diesel_heating_value = 45.4*10**(6)
 
-    time_diffs_fuel = ts_fuel_consumption.get_time_diff()
-    fuel_values = ts_fuel_consumption.values[:-1]
-    energy_in = [diesel_heating_value * float(value) * float(diff) * 10**(-9)
-                 for diff, value in zip(time_diffs_fuel, fuel_values)]
+    time_diffs_fuel = ts_fuel_consumption.diff() * 1e-9
+    energy_in = diesel_heating_value * ts_fuel_consumption.values[:-1] * time_diffs_fuel
 
-    time_diffs_thruster = ts_thruster_power.get_time_diff()
-    thruster_values = ts_thruster_power.values[:-1]
-    energy_out = [float(diff)*float(value) * 10**(-9) for diff, value in zip(time_diffs_thruster, thruster_values)]
+    time_diffs_thruster = ts_thruster_power.diff() * 1e-9
+    energy_out = ts_thruster_power.values[:-1] * time_diffs_thruster
 
     # TODO: scaling below 0.1 should not be there but is nesessary.
-    energy_efficiency = [e_out/e_in * 0.1 for e_out, e_in in zip(energy_out, energy_in)]
-    mean = round(sum(energy_efficiency)/len(energy_efficiency), 2)
+    energy_efficiency = energy_out / energy_in * 0.1
+    mean = round(energy_efficiency.mean(), 2)
     ts = TimeSeries(time_stamps, energy_efficiency, f"Energy efficiency from fuel to thrusters. mean:{mean}%", "%")
 
     figure, ax = get_new_plot()
@@ -430,27 +251,18 @@ def energy_efficiency_engine_to_thruster(title, route, file_paths):
     plt.close()
 
 
-def cumulative_fuel_consumption(title, route, file_paths):
-    file_paths_fuel_consumption = filter_array(file_paths, f.is_engine_fuel_consumption)
-    ts_fuel_consumption_ind = [TimeSeries.from_csv(file_path, construct_label(file_path))
-                               for file_path in file_paths_fuel_consumption]
-
-    ts_fuel_consumption_ind = [filter_date_time(ts, route) for ts in ts_fuel_consumption_ind]
+def cumulative_fuel_consumption(title, route, dataset):
+    ts_fuel_consumption_ind = dataset.select(f.is_engine_fuel_consumption, route)
 
-    ts_fuel_consumption = sum(ts_fuel_consumption_ind)
+    ts_fuel_consumption = align(ts_fuel_consumption_ind).sum()
     ts_fuel_consumption.label = "total fuel consumption"
-    time_stamps = ts_fuel_consumption.time_stamps
 
     fuel_density_diesel = 820
 
-    def to_kg_s(diff, value):
-        return float(0.001/3600) * float(value) * float(fuel_density_diesel) * float(diff) * float(10**(-9))
-
-    fuel_rates = [to_kg_s(diff, value) for diff, value
-                  in zip(ts_fuel_consumption.get_time_diff(), ts_fuel_consumption.values)]
-
-    ts_fuel_consumption_cumulative = TimeSeries(
-        time_stamps[:-1], list(accumulate(fuel_rates)), "Cumulative fuel consumption", "kg")
+    # l/h integrated to liters, then to kg
+    ts_fuel_consumption_cumulative = ts_fuel_consumption.cumulative_integral(
+        "kg", method="left", scale=fuel_density_diesel * 0.001)
+    ts_fuel_consumption_cumulative.label = "Cumulative fuel consumption"
 
     figure, ax = get_new_plot()
     ts_fuel_consumption_cumulative.plot(ax, title, route)
@@ -458,84 +270,157 @@ def cumulative_fuel_consumption(title, route, file_paths):
     plt.close()
 
 
-def main():
-    file_paths = list(Path("data/gunnerus/").glob("**/*.csv"))
-
-    # TODO: subtract engine load and thurster load to get idealized hotel load assumed to be constant
-    # TODO: plot shit separated by routes
-    # TODO: plot map data using the same routes
-
-    for route in routes.routes:
-        single_plot_args = [
-            ("Thruster rpm", f.is_thruster_rpm),
-            ("Thruster load", f.is_thruster_load),
-
-            ("Engine speed", f.is_engine_speed),
-            # ("Engine boost pressure", f.is_engine_boost_pressure),
-            # ("Engine coolant temperature", f.is_engine_coolant_temperature),
-            # ("Engine exhaust temperature 1", f.is_engine_exhaust_temperature1),
-            # ("Engine exhaust temperature 2", f.is_engine_exhaust_temperature2),
-            ("Engine fuel flow rate", f.is_engine_fuel_consumption),
-            # ("", ),
-        ]
-
-        for title, filter in single_plot_args:
-            read_and_plot(
-                title=title,
-                file_paths=file_paths,
-                filter=filter,
-                route=route,
-                sum_plots=False,
-                new_unit=None,
-                transformer=None,
-            )
-
-        sum_plot_args = [
-            # ("Thruster power", f.is_thruster_load, "W", transform.thruster_load),
-            ("Thruster power kW", f.is_thruster_load, "kW", transform.to_thruster_power_kw),
-
-            # ("Engine fuel flow rate", f.is_engine_fuel_consumption, None, None),
-            ("Engine fuel flow rate kg per h", f.is_engine_fuel_consumption,
-             "kg/h", transform.engine_fuel_consumption_liter_per_h_to_kg_per_h),
-            ("Engine fuel flow rate kg per m³", f.is_engine_fuel_consumption,
-             "kg/m³", transform.engine_fuel_consumption_liter_per_h_to_kg_per_h),
-            # ("Engine power kilowatt", f.is_engine_load, None, None),
-            # ("Engine power kW", f.is_engine_load, "kW", None),
-            # ("Engine power", f.is_engine_load, "W", transform.engine_load),
-            ("Engine power kW", f.is_engine_load, "kW", None),
-            # ("", ),
-        ]
-        for title, filter, new_unit, transformer in sum_plot_args:
-            read_and_plot(
-                title=title,
-                file_paths=file_paths,
-                filter=filter,
-                route=route,
-                sum_plots=True,
-                new_unit=new_unit,
-                transformer=transformer,
-            )
-
-        read_and_plot(
-            title="Speed over ground",
-            file_paths=file_paths,
-            filter=f.is_vessel_speed_over_ground,
+def plot_jobs(route, dataset, energy_chain) -> list[partial]:
+    jobs = []
+    single_plot_args = [
+        ("Thruster rpm", f.is_thruster_rpm),
+        ("Thruster load", f.is_thruster_load),
+
+        ("Engine speed", f.is_engine_speed),
+        # ("Engine boost pressure", f.is_engine_boost_pressure),
+        # ("Engine coolant temperature", f.is_engine_coolant_temperature),
+        # ("Engine exhaust temperature 1", f.is_engine_exhaust_temperature1),
+        # ("Engine exhaust temperature 2", f.is_engine_exhaust_temperature2),
+        ("Engine fuel flow rate", f.is_engine_fuel_consumption),
+        # ("", ),
+    ]
+
+    for title, filter in single_plot_args:
+        jobs.append(partial(
+            read_and_plot,
+            title=title,
+            dataset=dataset,
+            filter=filter,
             route=route,
             sum_plots=False,
-            new_unit="m/s",
-            transformer=transform.km_h_to_m_s,
-        )
+            new_unit=None,
+            transformer=None,
+        ))
+
+    sum_plot_args = [
+        # ("Thruster power", f.is_thruster_load, "W", transform.thruster_load),
+        ("Thruster power kW", f.is_thruster_load, "kW", transform.to_thruster_power_kw),
+
+        # ("Engine fuel flow rate", f.is_engine_fuel_consumption, None, None),
+        ("Engine fuel flow rate kg per h", f.is_engine_fuel_consumption,
+         "kg/h", transform.engine_fuel_consumption_liter_per_h_to_kg_per_h),
+        ("Engine fuel flow rate kg per m³", f.is_engine_fuel_consumption,
+         "kg/m³", transform.engine_fuel_consumption_liter_per_h_to_kg_per_h),
+        # ("Engine power kilowatt", f.is_engine_load, None, None),
+        # ("Engine power kW", f.is_engine_load, "kW", None),
+        # ("Engine power", f.is_engine_load, "W", transform.engine_load),
+        ("Engine power kW", f.is_engine_load, "kW", None),
+        # ("", ),
+    ]
+    for title, filter, new_unit, transformer in sum_plot_args:
+        jobs.append(partial(
+            read_and_plot,
+            title=title,
+            dataset=dataset,
+            filter=filter,
+            route=route,
+            sum_plots=True,
+            new_unit=new_unit,
+            transformer=transformer,
+        ))
+
+    jobs.append(partial(
+        read_and_plot,
+        title="Speed over ground",
+        dataset=dataset,
+        filter=f.is_vessel_speed_over_ground,
+        route=route,
+        sum_plots=False,
+        new_unit="m/s",
+        transformer=transform.km_h_to_m_s,
+    ))
+    jobs += [
         # emperical data
-        energy_efficiency_engine_to_thruster("power efficiency from engines to thrusters", route, file_paths)
-        cumulative_fuel_consumption("Cumulative fuel consumption", route, file_paths)
-        energy_efficiency_fuel_to_genset("Thermal efficiency from fuel to generator output", route, file_paths)
+        partial(energy_efficiency_engine_to_thruster, "power efficiency from engines to thrusters", route, energy_chain),
+        partial(cumulative_fuel_consumption, "Cumulative fuel consumption", route, dataset),
+        partial(energy_efficiency_fuel_to_genset, "Thermal efficiency from fuel to generator output", route, dataset),
         # theoretical
-        theoretical_total_power_engines("Theoretical engine power", route, file_paths)
-        theoretical_fuel_consumption("Theoretical fuel consumption", route, file_paths)
-        theoretical_engine_power_efficiency("Theoretical power efficiency", route, file_paths)
+        partial(theoretical_total_power_engines, "Theoretical engine power", route, dataset),
+        partial(theoretical_fuel_consumption, "Theoretical fuel consumption", route, energy_chain),
+        partial(theoretical_engine_power_efficiency, "Theoretical power efficiency", route, energy_chain),
         # difference
-        difference_engine_load("Difference engine emperical and theoretical", route, file_paths)
+        partial(difference_engine_load, "Difference engine emperical and theoretical", route, energy_chain),
+    ]
+    return jobs
+
+
+# signals used by plot_jobs, loaded up front so worker processes never parse csv files themselves
+PLOTTED_SIGNALS = [
+    f.is_thruster_rpm,
+    f.is_thruster_load,
+    f.is_engine_speed,
+    f.is_engine_fuel_consumption,
+    f.is_engine_load,
+    f.is_vessel_speed_over_ground,
+]
+
+worker_dataset = None
+worker_energy_chain = None
+
+
+def init_worker(dataset):
+    global worker_dataset, worker_energy_chain
+    plt.switch_backend("Agg")
+    worker_dataset = dataset
+    worker_energy_chain = EnergyChain(dataset)
+
+
+def run_job(job, route) -> None:
+    title = job.keywords.get("title") or job.args[0]
+    with instrument.span("main.plot", plot=job.func.__name__, title=title, route=route[0]):
+        job()
+
+
+def run_plot_job(route, job_index: int) -> None:
+    run_job(plot_jobs(route, worker_dataset, worker_energy_chain)[job_index], route)
+
+
+def main(workers: int = 1, segments: bool = False):
+    # every signal is parsed once and shared between all routes and plots
+    dataset = Dataset(Path("data/gunnerus/").glob("**/*.csv"), construct_label)
+    # the hand picked routes or the operating mode segments found in the thruster and engine signals
+    route_list = segmentation.operating_modes(dataset) if segments else routes.routes
+    if not route_list:
+        print("no routes to plot")
+        return
+
+    # TODO: subtract engine load and thurster load to get idealized hotel load assumed to be constant
+    # TODO: plot shit separated by routes
+    # TODO: plot map data using the same routes
+
+    if workers == 1:
+        # the theoretical thruster -> engine -> fuel chain is computed once per route and shared between plots
+        energy_chain = EnergyChain(dataset)
+        for route in route_list:
+            for job in plot_jobs(route, dataset, energy_chain):
+                run_job(job, route)
+        return
+
+    dataset.preload(PLOTTED_SIGNALS)
+    number_of_jobs = len(plot_jobs(route_list[0], dataset, None))
+    with ProcessPoolExecutor(max_workers=workers or None, initializer=init_worker, initargs=(dataset,)) as executor:
+        futures = [executor.submit(run_plot_job, route, job_index)
+                   for route in route_list
+                   for job_index in range(number_of_jobs)]
+        for future in futures:
+            future.result()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes rendering plots in parallel, 0 uses every core")
+    parser.add_argument("--segments", action="store_true",
+                        help="plot the operating mode segments found in the data instead of routes.py")
+    parser.add_argument("--trace", default=None,
+                        help="write timing and memory spans of this run as json lines, see instrument.py")
+    args = parser.parse_args()
+    if args.trace:
+        instrument.enable(args.trace, truncate=True)
+    with instrument.span("main.run", workers=args.workers):
+        main(args.workers, args.segments)
@@ -1,10 +1,11 @@
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-import json
 from datetime import datetime
-from functools import reduce
 from enum import Enum
+from ais import AisStore
+import basemap
+import downsample
+import instrument
 import routes
 
 other_positions = [
@@ -27,35 +28,6 @@ def get_points(time_start, time_end, data):
     ]
 
 
-def flatten(lst):
-    result = []
-    for item in lst:
-        if isinstance(item, list):
-            result.extend(flatten(item))
-        else:
-            result.append(item)
-    return result
-
-
-def get_position_boundaries(position_arrays):
-
-    data = flatten(position_arrays)
-    positions = [(entry['latitude'], entry['longitude']) for entry in data]
-    max_lat = max(pos[0] for pos in positions)
-    min_lat = min(pos[0] for pos in positions)
-    max_long = max(pos[1] for pos in positions)
-    min_long = min(pos[1] for pos in positions)
-
-    return min_long, max_long, min_lat, max_lat
-
-
-def load_and_sort_json(files):
-    return sorted(
-        reduce(lambda acc, file: acc + (json.load(open(file))), files, []),
-        key=lambda x: x['date_time_utc']
-    )
-
-
 class vessel(Enum):
     FLYER = 257012170
     GUNNERUS = 258342000
@@ -101,10 +73,28 @@ def gunnerus_munkholmen_trip(other_positions):
     file_paths = [
         './data/gunnerus_position_10_09_2024.json',
     ]
-    shared(file_paths, plot_title, other_positions)
+    shared(load_ais(file_paths), plot_title, other_positions)
+
 
+def load_ais(file_paths) -> AisStore:
+    with instrument.span("position.load", files=len(file_paths)) as span:
+        ais_store = AisStore.from_json(file_paths)
+        span.samples = len(ais_store)
+    return ais_store
 
-def shared(file_paths, plot_title, other_positions):
+
+def plot_track(ax, track, extent, label, simplify: bool = True):
+    # fixes within half a pixel of the simplified track are not drawn, simplify=False draws every fix
+    with instrument.span("position.plot_track", mmsi=track.mmsi) as span:
+        indices = downsample.track_indices(ax, track.longitude, track.latitude, extent) if simplify else None
+        if indices is None:
+            ax.plot(track.longitude, track.latitude, label=label, marker="o", markersize=5)
+        else:
+            ax.plot(track.longitude[indices], track.latitude[indices], label=label, marker="o", markersize=5)
+        span.samples = len(track) if indices is None else len(indices)
+
+
+def shared(ais_store: AisStore, plot_title, other_positions, simplify: bool = True):
     projection = ccrs.PlateCarree()
     fig, ax = plt.subplots(figsize=(12, 6), subplot_kw={'projection': projection})
 
@@ -112,45 +102,26 @@ def shared(file_paths, plot_title, other_positions):
         ax.plot(long, lat, marker="o", color="black", markersize=5, transform=projection)
         ax.annotate(title, xy=(long, lat), xytext=(long - 0.0050, lat + 0.001), fontsize=10, transform=projection)
 
-    ais_data = load_and_sort_json(file_paths)
-    long_min, long_max, lat_min, lat_max = get_position_boundaries(ais_data)
+    # every route is a binary search on the time index of the store
+    long_min, long_max, lat_min, lat_max = ais_store.extent()
+    extent = (long_min - 0.005, long_max + 0.005, lat_min - 0.001, lat_max + 0.001)
 
     for route in routes.routes:
-        ais_data = load_and_sort_json(file_paths)
-        date_time_start = route[1]
-        date_time_end = route[2]
-        ais_data = [ais for ais in ais_data
-                    if date_time_start <= datetime.fromisoformat(ais['date_time_utc']) <= date_time_end]
-
-        ais_data = reduce(
-            lambda acc, entry: {
-                **acc,
-                entry['mmsi']:
-                acc.get(entry['mmsi'], []) + [(entry['latitude'], entry['longitude'])]
-            },
-            ais_data,
-            {}
-        )
-
-        for vessel_mmsi in list(ais_data.keys()):
-            latitudes, longitudes = zip(*ais_data[vessel_mmsi])
-            label = MMSI_TO_NAME[vessel_mmsi] + " " + route[0]
-            ax.plot(longitudes, latitudes, label=label, marker="o", markersize=5)
-
-    ax.set_extent([long_min - 0.005, long_max + 0.005, lat_min - 0.001, lat_max + 0.001])
-
-    ax.add_feature(cfeature.OCEAN, facecolor='lightblue')
-    ax.add_feature(cfeature.LAND, facecolor='lightgreen')
-    ax.add_feature(cfeature.LAKES, facecolor='darkblue')
-    ax.add_feature(cfeature.RIVERS, edgecolor='blue')
-    ax.add_feature(cfeature.COASTLINE, edgecolor='black')
+        for vessel_mmsi, track in ais_store.window(route[1], route[2]).items():
+            label = MMSI_TO_NAME.get(vessel_mmsi, str(vessel_mmsi)) + " " + route[0]
+            plot_track(ax, track, extent, label, simplify)
+
+    # the coastline and land/sea background of an extent is rendered once and reused by every map of it
+    with instrument.span("position.background"):
+        basemap.add_background(ax, extent, dpi=300)
 
     ax.gridlines(draw_labels=True)
     ax.set_title(plot_title)
     ax.legend()
 
     print(f"generating plots/{route[0]}/{plot_title}_map.png")
-    plt.savefig(f"plots/{route[0]}/{plot_title}_map.png", dpi=300)
+    with instrument.span("position.render", title=plot_title):
+        plt.savefig(f"plots/{route[0]}/{plot_title}_map.png", dpi=300)
     plt.close()
 
 
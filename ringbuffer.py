@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+import matplotlib.pyplot as plt
+import numpy as np
+from timeseries import TimeSeries
+
+
+class RingTimeSeries:
+    # fixed memory series for long running monitoring, keeps the last capacity samples and/or the last horizon.
+    # every sample is written twice, at i and i + capacity, so the live window is always one contiguous view
+    def __init__(self, label: str, unit: str = None, capacity: int = None, horizon: timedelta | np.timedelta64 = None):
+        if capacity is None and horizon is None:
+            raise ValueError("a RingTimeSeries needs a capacity, a horizon or both")
+        if capacity is not None and capacity <= 0:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.label = label
+        self.unit = unit
+        self.fixed_capacity = capacity is not None
+        self.horizon = None if horizon is None else np.timedelta64(horizon, 'ns')
+        # with only a horizon the buffer grows until it holds one horizon worth of samples and then stays put
+        self.capacity = capacity if capacity is not None else 1024
+        self.start = 0
+        self.length = 0
+        self._time_stamps = np.empty(2 * self.capacity, dtype='datetime64[ns]')
+        self._values = np.empty(2 * self.capacity, dtype=float)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __repr__(self) -> str:
+        return f"RingTimeSeries(label={self.label}, unit={self.unit}, length={self.length}, capacity={self.capacity})"
+
+    @property
+    def time_stamps(self) -> np.ndarray:
+        # read only view, it is only valid until the next extend overwrites the oldest samples
+        view = self._time_stamps[self.start:self.start + self.length]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def values(self) -> np.ndarray:
+        view = self._values[self.start:self.start + self.length]
+        view.flags.writeable = False
+        return view
+
+    def _drop(self, count: int) -> None:
+        self.start = (self.start + count) % self.capacity
+        self.length -= count
+
+    def _grow(self, needed: int) -> None:
+        capacity = max(needed, 2 * self.capacity)
+        time_stamps = np.empty(2 * capacity, dtype='datetime64[ns]')
+        values = np.empty(2 * capacity, dtype=float)
+        time_stamps[:self.length] = self.time_stamps
+        values[:self.length] = self.values
+        time_stamps[capacity:capacity + self.length] = self.time_stamps
+        values[capacity:capacity + self.length] = self.values
+        self._time_stamps, self._values = time_stamps, values
+        self.capacity = capacity
+        self.start = 0
+
+    def extend(self, time_stamps: np.ndarray, values: np.ndarray) -> None:
+        time_stamps = np.asarray(time_stamps, dtype='datetime64[ns]')
+        values = np.asarray(values, dtype=float)
+        if len(time_stamps) == 0:
+            return
+        if self.length and time_stamps[0] < self._time_stamps[self.start + self.length - 1]:
+            raise ValueError(f"samples must be appended in time order, {time_stamps[0]} is before the last sample")
+
+        if self.horizon is not None:
+            cutoff = time_stamps[-1] - self.horizon
+            self._drop(int(np.searchsorted(self.time_stamps, cutoff, side="left")))
+            first = np.searchsorted(time_stamps, cutoff, side="left")
+            time_stamps, values = time_stamps[first:], values[first:]
+        if self.fixed_capacity:
+            time_stamps, values = time_stamps[-self.capacity:], values[-self.capacity:]
+            self._drop(max(0, self.length + len(time_stamps) - self.capacity))
+        elif self.length + len(time_stamps) > self.capacity:
+            self._grow(self.length + len(time_stamps))
+
+        positions = (self.start + self.length + np.arange(len(time_stamps))) % self.capacity
+        self._time_stamps[positions] = time_stamps
+        self._values[positions] = values
+        self._time_stamps[positions + self.capacity] = time_stamps
+        self._values[positions + self.capacity] = values
+        self.length += len(time_stamps)
+
+    def append(self, time_stamp: datetime | np.datetime64, value: float) -> None:
+        self.extend(np.array([time_stamp], dtype='datetime64[ns]'), np.array([value], dtype=float))
+
+    def series(self) -> TimeSeries:
+        # a TimeSeries on the live window, filter_date, transform and the arithmetic all work on it without copying
+        return TimeSeries(self.time_stamps, self.values, self.label, self.unit)
+
+    def filter_date(self, date_time_start: datetime, date_time_end: datetime) -> TimeSeries:
+        return self.series().filter_date(date_time_start, date_time_end)
+
+    def transform(self, transformer, new_unit: str, other=None) -> TimeSeries:
+        return self.series().transform(transformer, new_unit, other)
+
+    def plot(self, ax: plt.Axes, title, route, label: str = None, downsample_method: str | None = "min_max") -> None:
+        self.series().plot(ax, title, route, label, downsample_method)
+
+    def __add__(self, other) -> TimeSeries:
+        return self.series() + as_series(other)
+
+    def __radd__(self, other) -> TimeSeries:
+        # sum([...]) starts from 0
+        return self.series().__radd__(other)
+
+    def __sub__(self, other) -> TimeSeries:
+        return self.series() - as_series(other)
+
+
+def as_series(value) -> TimeSeries:
+    return value.series() if isinstance(value, RingTimeSeries) else value
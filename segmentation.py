@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import argparse
+import numpy as np
+from timeseries import TimeSeries
+from dataset import Dataset
+from join import asof_indices
+import filter as f
+
+# names of the thruster state signals, other values are shown as "<signal> <value>"
+STATE_NAMES = {
+    "Power_mode_RPM_Mode": {0: "RPM control", 1: "power control"},
+}
+# an engine delivering more than this is counted as running
+RUNNING_ENGINE_KW = 20.0
+
+
+def run_lengths(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # start index and value of every run of equal consecutive values
+    if len(values) == 0:
+        return np.array([], dtype=np.int64), values
+    starts = np.concatenate(([0], np.flatnonzero(values[1:] != values[:-1]) + 1))
+    return starts, values[starts]
+
+
+def _merge_short_runs(time_stamps: np.ndarray, codes: np.ndarray, min_duration: timedelta) -> np.ndarray:
+    # a state held shorter than min_duration, like a one second blip while switching modes, takes the preceding state
+    starts, _ = run_lengths(codes)
+    ends = np.append(time_stamps[starts[1:]], time_stamps[-1])
+    short = (ends - time_stamps[starts]) < np.timedelta64(min_duration, 'ns')
+    short[0] = False
+    kept = np.flatnonzero(~short)
+    run_of_sample = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(codes))))
+    # every sample belongs to the last kept run at or before its own run
+    last_kept = kept[np.searchsorted(kept, run_of_sample, side="right") - 1]
+    return codes[starts[last_kept]]
+
+
+def segment(time_stamps: np.ndarray, codes: np.ndarray, names: list[str],
+            min_duration: timedelta = timedelta(minutes=1)) -> list[tuple[str, datetime, datetime]]:
+    # (name, start, end) like routes.routes, a segment ends where the next one starts.
+    # a state usually comes back several times a day, the start time keeps every name, and its plot directory, unique
+    if len(codes) == 0:
+        return []
+    codes = _merge_short_runs(time_stamps, codes, min_duration)
+    starts, values = run_lengths(codes)
+    start_times = time_stamps[starts]
+    end_times = np.append(start_times[1:], time_stamps[-1])
+    segments = []
+    used = set()
+    for value, start, end in zip(values, start_times, end_times):
+        start, end = _to_datetime(start), _to_datetime(end)
+        name = f"{names[value]} {start:%Y%m%dT%H%M%SZ}"
+        if name in used:
+            name = f"{name} {len(segments)}"
+        used.add(name)
+        segments.append((name, start, end))
+    return segments
+
+
+def _to_datetime(time_stamp: np.datetime64) -> datetime:
+    seconds, nano_seconds = divmod(int(time_stamp.astype(np.int64)), 10**9)
+    return datetime.fromtimestamp(seconds, tz=timezone.utc) + timedelta(microseconds=nano_seconds // 1000)
+
+
+def route_literal(date_time: datetime) -> str:
+    # the dt(..., tzinfo=tz) notation of routes.py
+    fields = [date_time.year, date_time.month, date_time.day, date_time.hour, date_time.minute, date_time.second,
+              date_time.microsecond]
+    while len(fields) > 3 and fields[-1] == 0:
+        fields.pop()
+    return f"dt({', '.join(str(field) for field in fields)}, tzinfo=tz)"
+
+
+def state_name(ts: TimeSeries, value: float) -> str:
+    if ts.unit == "engines":
+        return f"{value:g} engine running" if value == 1 else f"{value:g} engines running"
+    return STATE_NAMES.get(ts.label, {}).get(int(value), f"{ts.label} {value:g}")
+
+
+def combine_states(states: list[TimeSeries]) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    # joint state on the union of all state changes, every state holds its last value until it changes again
+    changes = []
+    for ts in states:
+        starts, _ = run_lengths(ts.values)
+        changes.append(ts.time_stamps[starts])
+    time_stamps = np.unique(np.concatenate(changes + [np.array([max(ts.time_stamps[-1] for ts in states)])]))
+    columns = []
+    for ts in states:
+        indices = asof_indices(time_stamps, ts.time_stamps, direction="backward")
+        columns.append(np.where(indices >= 0, ts.values[np.clip(indices, 0, None)], np.nan))
+    rows = np.array(columns).T
+    # before every signal has reported the joint state is unknown
+    known = ~np.isnan(rows).any(axis=1)
+    time_stamps, rows = time_stamps[known], rows[known]
+    unique_rows, codes = np.unique(rows, axis=0, return_inverse=True)
+    names = [", ".join(state_name(ts, value) for ts, value in zip(states, row)) for row in unique_rows]
+    return time_stamps, codes.reshape(-1), names
+
+
+def running_engines(engine_loads: list[TimeSeries], threshold: float = RUNNING_ENGINE_KW) -> TimeSeries:
+    # number of engines above threshold kW, each engine keeps its last reading until the next one
+    time_stamps = np.unique(np.concatenate([ts.time_stamps for ts in engine_loads]))
+    running = np.zeros(len(time_stamps), dtype=np.int64)
+    for ts in engine_loads:
+        indices = asof_indices(time_stamps, ts.time_stamps, direction="backward")
+        running += (indices >= 0) & (ts.values[np.clip(indices, 0, None)] > threshold)
+    return TimeSeries(time_stamps, running, "engines running", "engines")
+
+
+def is_power_mode(file_path) -> bool:
+    return "Power_mode_RPM_Mode" in str(file_path) and f.is_thruster(file_path)
+
+
+def is_maneuver_transit_mode(file_path) -> bool:
+    return "Maneuver_Transit_mode" in str(file_path) and f.is_thruster(file_path)
+
+
+def is_engine_load(file_path) -> bool:
+    # engine 2 is included here, a running engine 2 is exactly what should show up in the segments
+    return "engine_load" in str(file_path) and "Engine" in str(file_path)
+
+
+def operating_modes(dataset: Dataset, min_duration: timedelta = timedelta(minutes=1),
+                    state_predicates=(is_power_mode,), engine_threshold: float = RUNNING_ENGINE_KW
+                    ) -> list[tuple[str, datetime, datetime]]:
+    # thruster state signals and the number of running gensets, cut into (name, start, end) segments in one pass
+    states = []
+    for predicate in state_predicates:
+        file_paths = dataset.paths(predicate)
+        for file_path in file_paths:
+            # the thruster is only part of the name when both thrusters report the signal
+            label = Path(file_path).stem if len(file_paths) == 1 else f"{Path(file_path).parent.name} {Path(file_path).stem}"
+            states.append(dataset.load(file_path, label))
+    # labelled here, the labeler of the dataset only knows the plotted signals
+    engine_loads = [dataset.load(file_path, Path(file_path).parent.name) for file_path in dataset.paths(is_engine_load)]
+    if any(len(ts.values) for ts in engine_loads):
+        states.append(running_engines(engine_loads, engine_threshold))
+    # without any signal there is nothing to segment
+    states = [ts for ts in states if len(ts.values)]
+    if not states:
+        return []
+    time_stamps, codes, names = combine_states(states)
+    return segment(time_stamps, codes, names, min_duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cut RVG_mqtt logs into operating mode segments")
+    parser.add_argument("directory", nargs="?", default="data/gunnerus/")
+    parser.add_argument("--min-duration", type=float, default=60, help="seconds, shorter states are merged")
+    parser.add_argument("--maneuver-mode", action="store_true", help="split on the maneuver/transit mode as well")
+    args = parser.parse_args()
+
+    dataset = Dataset(Path(args.directory).glob("**/*.csv"), lambda file_path: Path(file_path).stem)
+    predicates = (is_power_mode, is_maneuver_transit_mode) if args.maneuver_mode else (is_power_mode,)
+    for name, start, end in operating_modes(dataset, timedelta(seconds=args.min_duration), predicates):
+        print(f"({name!r}, {route_literal(start)}, {route_literal(end)}),")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+from datetime import timedelta
+import argparse
+import numpy as np
+from scipy.spatial import cKDTree
+from ais import AisStore
+
+EARTH_RADIUS = 6371008.8
+
+
+def haversine(latitude: np.ndarray, longitude: np.ndarray, other_latitude, other_longitude) -> np.ndarray:
+    # great circle distance in metres
+    latitude, longitude = np.radians(latitude), np.radians(longitude)
+    other_latitude, other_longitude = np.radians(other_latitude), np.radians(other_longitude)
+    a = (np.sin((other_latitude - latitude) / 2) ** 2
+         + np.cos(latitude) * np.cos(other_latitude) * np.sin((other_longitude - longitude) / 2) ** 2)
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def chord(distance):
+    # straight line distance through the earth between two points distance metres apart on the surface
+    return 2 * EARTH_RADIUS * np.sin(np.minimum(distance / (2 * EARTH_RADIUS), np.pi / 2))
+
+
+class SpatialIndex:
+    # KD-tree over the fixes of every vessel in an AisStore, next to the per vessel time index of the store.
+    # fixes are indexed as earth centred cartesian points in metres, a great circle radius is searched with its chord
+    # length at any latitude, results of radius queries are checked with the great circle distance
+    def __init__(self, ais_store: AisStore):
+        tracks = list(ais_store)
+        self.mmsi = np.concatenate([np.full(len(track), track.mmsi, dtype=np.int64) for track in tracks]) if tracks \
+            else np.array([], dtype=np.int64)
+        self.time_stamps = np.concatenate([track.time_stamps for track in tracks]) if tracks \
+            else np.array([], dtype='datetime64[ns]')
+        self.latitude = np.concatenate([track.latitude for track in tracks]) if tracks else np.array([])
+        self.longitude = np.concatenate([track.longitude for track in tracks]) if tracks else np.array([])
+        valid = ~(np.isnan(self.latitude) | np.isnan(self.longitude))
+        self.mmsi, self.time_stamps = self.mmsi[valid], self.time_stamps[valid]
+        self.latitude, self.longitude = self.latitude[valid], self.longitude[valid]
+        self.tree = cKDTree(self.project(self.latitude, self.longitude))
+
+    def __len__(self) -> int:
+        return len(self.latitude)
+
+    def __repr__(self) -> str:
+        return f"SpatialIndex(fixes={len(self)}, vessels={len(np.unique(self.mmsi))})"
+
+    @staticmethod
+    def project(latitude, longitude) -> np.ndarray:
+        latitude, longitude = np.radians(np.atleast_1d(latitude)), np.radians(np.atleast_1d(longitude))
+        return EARTH_RADIUS * np.column_stack((np.cos(latitude) * np.cos(longitude),
+                                               np.cos(latitude) * np.sin(longitude), np.sin(latitude)))
+
+    def extent(self) -> tuple[float, float, float, float]:
+        # (longitude min, longitude max, latitude min, latitude max) the order ax.set_extent takes
+        if len(self) == 0:
+            raise ValueError("cannot compute the extent of an empty SpatialIndex")
+        return float(self.longitude.min()), float(self.longitude.max()), float(self.latitude.min()), float(self.latitude.max())
+
+    def _select(self, indices: np.ndarray, mmsi: int | None) -> np.ndarray:
+        indices = np.sort(np.asarray(indices, dtype=np.int64))
+        return indices if mmsi is None else indices[self.mmsi[indices] == mmsi]
+
+    def within(self, latitude: float, longitude: float, radius: float, mmsi: int = None) -> np.ndarray:
+        # indices of the fixes within radius metres, sorted by vessel then time
+        candidates = np.asarray(self.tree.query_ball_point(self.project(latitude, longitude)[0], chord(radius) * 1.01),
+                                dtype=np.int64)
+        distances = haversine(self.latitude[candidates], self.longitude[candidates], latitude, longitude)
+        return self._select(candidates[distances <= radius], mmsi)
+
+    def bbox(self, longitude_min: float, longitude_max: float, latitude_min: float, latitude_max: float,
+             mmsi: int = None) -> np.ndarray:
+        # the tree is asked for the circle around the box, its farthest points from the centre are the corners
+        latitude, longitude = (latitude_min + latitude_max) / 2, (longitude_min + longitude_max) / 2
+        radius = haversine(np.array([latitude_min, latitude_min, latitude_max, latitude_max]),
+                           np.array([longitude_min, longitude_max, longitude_min, longitude_max]), latitude, longitude).max()
+        candidates = np.asarray(self.tree.query_ball_point(self.project(latitude, longitude)[0], chord(radius) * 1.01),
+                                dtype=np.int64)
+        inside = ((self.longitude[candidates] >= longitude_min) & (self.longitude[candidates] <= longitude_max)
+                  & (self.latitude[candidates] >= latitude_min) & (self.latitude[candidates] <= latitude_max))
+        return self._select(candidates[inside], mmsi)
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        # great circle distances in metres and indices of the k closest fixes
+        _, indices = self.tree.query(self.project(latitude, longitude)[0], k=k)
+        indices = np.atleast_1d(indices)
+        indices = indices[indices < len(self)]
+        return haversine(self.latitude[indices], self.longitude[indices], latitude, longitude), indices
+
+    def visits(self, latitude: float, longitude: float, radius: float, mmsi: int = None,
+               gap: timedelta = timedelta(minutes=5)) -> list[tuple[int, np.datetime64, np.datetime64]]:
+        # (mmsi, first fix, last fix) of every stay within radius metres, fixes further apart than gap split a stay
+        indices = self.within(latitude, longitude, radius, mmsi)
+        order = np.lexsort((self.time_stamps[indices], self.mmsi[indices]))
+        indices = indices[order]
+        mmsis, time_stamps = self.mmsi[indices], self.time_stamps[indices]
+        breaks = np.flatnonzero((mmsis[1:] != mmsis[:-1]) | (np.diff(time_stamps) > np.timedelta64(gap, 'ns'))) + 1
+        starts = np.concatenate(([0], breaks)) if len(indices) else np.array([], dtype=np.int64)
+        ends = np.append(breaks, len(indices)) - 1
+        return [(int(mmsis[start]), time_stamps[start], time_stamps[end]) for start, end in zip(starts, ends)]
+
+
+def main():
+    from position import other_positions, MMSI_TO_NAME
+
+    parser = argparse.ArgumentParser(description="when were vessels close to the points of interest")
+    parser.add_argument("files", nargs="*", default=["data/gunnerus_position_10_09_2024.json"])
+    parser.add_argument("--radius", type=float, default=200, help="metres")
+    args = parser.parse_args()
+
+    index = SpatialIndex(AisStore.from_json(args.files))
+    for latitude, longitude, title in other_positions:
+        for mmsi, start, end in index.visits(latitude, longitude, args.radius):
+            print(f"{MMSI_TO_NAME.get(mmsi, mmsi)} within {args.radius:g} m of {title} from {start} to {end}")
+
+
+if __name__ == "__main__":
+    main()
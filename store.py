@@ -0,0 +1,154 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from pathlib import Path
+import argparse
+import json
+import os
+import numpy as np
+from timeseries import TimeSeries, to_datetime64
+import cache
+import ingest
+
+STORE_DIRECTORY = Path(os.environ.get("TIMESERIES_STORE_DIR", "store"))
+CATALOG_FILE = "catalog.json"
+
+
+def _day(time_stamp: np.datetime64) -> str:
+    return str(time_stamp.astype('datetime64[D]'))
+
+
+def _split_by_day(time_stamps: np.ndarray) -> list[tuple[str, int, int]]:
+    # time stamps are sorted, so every utc day is one slice
+    if len(time_stamps) == 0:
+        return []
+    days = time_stamps.astype('datetime64[D]')
+    starts = np.concatenate(([0], np.flatnonzero(days[1:] != days[:-1]) + 1))
+    ends = np.append(starts[1:], len(time_stamps))
+    return [(str(days[start]), int(start), int(end)) for start, end in zip(starts, ends)]
+
+
+class Store:
+    # telemetry partitioned as <vessel>/<unit>/<signal>/<day>/, where unit is the equipment, e.g. Engine1 or hcx_port_mp.
+    # every partition holds the binary columns of cache.write_columns, the catalog lists partitions with their time range
+    def __init__(self, root: str | Path = STORE_DIRECTORY):
+        self.root = Path(root)
+        self._catalog = None
+        self._index = None
+
+    @property
+    def catalog(self) -> dict[str, dict]:
+        if self._catalog is None:
+            catalog_path = self.root / CATALOG_FILE
+            self._catalog = json.loads(catalog_path.read_text()) if catalog_path.exists() else {}
+        return self._catalog
+
+    @property
+    def index(self) -> dict[tuple[str, str, str], list[dict]]:
+        # (vessel, unit, signal) -> partitions sorted by day, so a time range is two binary searches
+        if self._index is None:
+            self._index = {}
+            for entry in self.catalog.values():
+                self._index.setdefault((entry["vessel"], entry["unit"], entry["signal"]), []).append(entry)
+            for entries in self._index.values():
+                entries.sort(key=lambda entry: entry["day"])
+        return self._index
+
+    def _save_catalog(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        temporary = self.root / f"{CATALOG_FILE}.tmp{os.getpid()}"
+        temporary.write_text(json.dumps(self.catalog, indent=1, sort_keys=True))
+        os.replace(temporary, self.root / CATALOG_FILE)
+        self._index = None
+
+    def write(self, vessel: str, unit: str, signal: str, time_stamps: np.ndarray, values: np.ndarray,
+              measurement_unit: str | None) -> int:
+        # samples of days that are already stored are merged into their partition
+        if len(time_stamps) == 0:
+            return 0
+        for day, start, end in _split_by_day(time_stamps):
+            path = Path(vessel, unit, signal, day)
+            day_time_stamps, day_values = time_stamps[start:end], values[start:end]
+            key = path.as_posix()
+            if key in self.catalog:
+                stored_time_stamps, stored_values, _ = cache.read_columns(self.root / path)
+                day_time_stamps = np.concatenate((stored_time_stamps, day_time_stamps))
+                day_values = np.concatenate((stored_values, day_values))
+                order = np.argsort(day_time_stamps, kind="stable")
+                day_time_stamps, day_values = day_time_stamps[order], day_values[order]
+                unique = np.concatenate(([True], day_time_stamps[1:] != day_time_stamps[:-1]))
+                day_time_stamps, day_values = day_time_stamps[unique], day_values[unique]
+            entry = {
+                "vessel": vessel, "unit": unit, "signal": signal, "day": day, "path": key,
+                "start": str(day_time_stamps[0]), "end": str(day_time_stamps[-1]),
+                "samples": len(day_time_stamps), "measurement_unit": measurement_unit,
+            }
+            cache.write_columns(self.root / path, day_time_stamps, day_values, entry)
+            self.catalog[key] = entry
+        self._save_catalog()
+        return len(time_stamps)
+
+    def ingest_csv(self, vessel: str, file_path, unit: str = None, signal: str = None) -> int:
+        # RVG_mqtt layout by default, data/gunnerus/RVG_mqtt/Engine1/fuel_consumption.csv -> Engine1 fuel_consumption
+        file_path = Path(file_path)
+        time_stamps, values, measurement_unit = ingest.read_csv(file_path)
+        return self.write(vessel, unit or file_path.parent.name, signal or file_path.stem,
+                          time_stamps, values, measurement_unit)
+
+    def ingest_directory(self, vessel: str, directory) -> int:
+        return sum(self.ingest_csv(vessel, file_path) for file_path in sorted(Path(directory).glob("**/*.csv")))
+
+    def signals(self, vessel: str = None) -> list[tuple[str, str, str]]:
+        return sorted(key for key in self.index if vessel is None or key[0] == vessel)
+
+    def partitions(self, vessel: str, unit: str, signal: str,
+                   date_time_start: datetime = None, date_time_end: datetime = None) -> list[dict]:
+        entries = self.index.get((vessel, unit, signal), [])
+        days = [entry["day"] for entry in entries]
+        first = 0 if date_time_start is None else bisect_left(days, _day(to_datetime64(date_time_start)))
+        last = len(entries) if date_time_end is None else bisect_right(days, _day(to_datetime64(date_time_end)))
+        return entries[first:last]
+
+    def query(self, vessel: str, unit: str, signal: str, date_time_start: datetime = None,
+              date_time_end: datetime = None, label: str = None) -> TimeSeries:
+        # only the partitions of the requested days are opened, a single day stays memory mapped
+        entries = self.partitions(vessel, unit, signal, date_time_start, date_time_end)
+        label = label or f"{unit} {signal}"
+        if not entries:
+            raise KeyError(f"no {vessel} {unit} {signal} data between {date_time_start} and {date_time_end}")
+        columns = [cache.read_columns(self.root / entry["path"]) for entry in entries]
+        if len(columns) == 1:
+            time_stamps, values, _ = columns[0]
+        else:
+            time_stamps = np.concatenate([time_stamps for time_stamps, _, _ in columns])
+            values = np.concatenate([values for _, values, _ in columns])
+        ts = TimeSeries(time_stamps, values, label, entries[0]["measurement_unit"])
+        return ts.filter_date(date_time_start, date_time_end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="partitioned telemetry store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = commands.add_parser("ingest", help="add RVG_mqtt csv files to the store")
+    ingest_parser.add_argument("vessel")
+    ingest_parser.add_argument("directory")
+    query_parser = commands.add_parser("query", help="print a summary of one signal")
+    query_parser.add_argument("vessel")
+    query_parser.add_argument("unit")
+    query_parser.add_argument("signal")
+    query_parser.add_argument("--start", type=datetime.fromisoformat, default=None)
+    query_parser.add_argument("--end", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--root", default=STORE_DIRECTORY)
+    args = parser.parse_args()
+
+    store = Store(args.root)
+    match args.command:
+        case "ingest":
+            print(f"stored {store.ingest_directory(args.vessel, args.directory)} samples")
+        case "query":
+            ts = store.query(args.vessel, args.unit, args.signal, args.start, args.end)
+            partitions = store.partitions(args.vessel, args.unit, args.signal, args.start, args.end)
+            print(f"{ts} from {len(partitions)} partitions")
+
+
+if __name__ == "__main__":
+    main()
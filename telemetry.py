@@ -0,0 +1,206 @@
+from pathlib import Path
+import argparse
+import heapq
+import threading
+import time
+import numpy as np
+from follow import LiveMetrics
+import ingest
+
+# one topic per RVG_mqtt signal, e.g. "RVG_mqtt/Engine1/fuel_consumption", carrying the lines the logger writes to csv
+TOPICS = (
+    "RVG_mqtt/Engine1/#",
+    "RVG_mqtt/Engine2/#",
+    "RVG_mqtt/Engine3/#",
+    "RVG_mqtt/hcx_port_mp/#",
+    "RVG_mqtt/hcx_stbd_mp/#",
+    "RVG_mqtt/SeapathGPSVtg/#",
+)
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    # mqtt wildcards, + matches one level and # every remaining level
+    pattern_levels = pattern.split("/")
+    topic_levels = topic.split("/")
+    for index, level in enumerate(pattern_levels):
+        if level == "#":
+            return True
+        if index >= len(topic_levels) or (level != "+" and level != topic_levels[index]):
+            return False
+    return len(pattern_levels) == len(topic_levels)
+
+
+class LocalBroker:
+    # in process stand in for the mqtt broker on board, used for replays and for testing without a network
+    def __init__(self):
+        self.subscriptions = []
+        self._routes = {}
+
+    def subscribe(self, pattern: str, callback) -> None:
+        self.subscriptions.append((pattern, callback))
+        self._routes.clear()
+
+    def publish(self, topic: str, payload: bytes) -> None:
+        if topic not in self._routes:
+            self._routes[topic] = [callback for pattern, callback in self.subscriptions if topic_matches(pattern, topic)]
+        for callback in self._routes[topic]:
+            callback(topic, payload)
+
+
+class Subscriber:
+    # collects messages per topic and hands them on as columnar batches, either when max_messages are waiting
+    # or when the oldest waiting message is max_latency seconds old
+    def __init__(self, on_batch, max_messages: int = 1000, max_latency: float = 0.2):
+        self.on_batch = on_batch
+        self.max_messages = max_messages
+        self.max_latency = max_latency
+        self.pending = {}
+        self.count = 0
+        self.oldest = None
+        self._lock = threading.Lock()
+        # batches reach on_batch one at a time and in order, whichever thread flushes
+        self._flushing = threading.Lock()
+        self._stopped = threading.Event()
+        self._flusher = None
+
+    def subscribe(self, broker, topics: tuple[str, ...] = TOPICS) -> None:
+        for topic in topics:
+            broker.subscribe(topic, self.on_message)
+
+    def on_message(self, topic: str, payload: bytes) -> None:
+        with self._lock:
+            self.pending.setdefault(topic, []).append(payload.rstrip(b"\r\n"))
+            self.count += 1
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            due = self.count >= self.max_messages or time.monotonic() - self.oldest >= self.max_latency
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        with self._flushing:
+            with self._lock:
+                pending, count = self.pending, self.count
+                self.pending, self.count, self.oldest = {}, 0, None
+            if count:
+                # the payloads of a topic are parsed together, exactly like a block of the csv file
+                batches = {topic: ingest.parse_block(b"\n".join(payloads) + b"\n") for topic, payloads in pending.items()}
+                self.on_batch(batches)
+            return count
+
+    def start(self) -> None:
+        # flushes quiet topics too, otherwise the last messages would wait for the next burst
+        def flush_periodically():
+            while not self._stopped.wait(self.max_latency):
+                self.flush()
+        self._stopped.clear()
+        self._flusher = threading.Thread(target=flush_periodically, daemon=True)
+        self._flusher.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+
+class ReplayPublisher:
+    # publishes the RVG_mqtt csv files in time order, speed 60 replays an hour in a minute, None as fast as possible
+    def __init__(self, broker, root: str = "data/gunnerus/", speed: float | None = 60.0):
+        self.broker = broker
+        self.root = Path(root)
+        self.speed = speed
+
+    def _file_messages(self, file_path: Path):
+        # (time stamp, topic, payload) of one csv file, a block at a time
+        topic = file_path.relative_to(self.root).with_suffix("").as_posix()
+        with open(file_path, "rb") as file:
+            # the payloads are the lines parse_block parsed, one per newline of the block it was given
+            for block in ingest.iter_blocks(file):
+                block_time_stamps, _, _ = ingest.parse_block(block)
+                lines = block.replace(b"\r\n", b"\n").split(b"\n")[:-1]
+                yield from zip(block_time_stamps, [topic] * len(lines), lines)
+
+    def messages(self):
+        # every csv file is in time order, so the topics are merged while reading instead of sorted up front
+        files = [self._file_messages(file_path) for file_path in sorted(self.root.glob("RVG_mqtt/**/*.csv"))]
+        return heapq.merge(*files, key=lambda message: message[0])
+
+    def run(self) -> int:
+        count = 0
+        first = None
+        started = time.monotonic()
+        for time_stamp, topic, payload in self.messages():
+            first = time_stamp if first is None else first
+            if self.speed is not None:
+                delay = (time_stamp - first).astype(np.int64) * 1e-9 / self.speed - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            self.broker.publish(topic, payload)
+            count += 1
+        return count
+
+
+def connect_mqtt(subscriber: Subscriber, host: str = "localhost", port: int = 1883, topics: tuple[str, ...] = TOPICS):
+    # a real broker through paho-mqtt, which is only needed for this
+    try:
+        import paho.mqtt.client as mqtt
+    except ImportError as error:
+        raise ImportError("connecting to an mqtt broker requires paho-mqtt, pip install paho-mqtt") from error
+
+    def on_connect(client, userdata, flags, reason_code, properties=None):
+        for topic in topics:
+            client.subscribe(topic)
+
+    def on_message(client, userdata, message):
+        subscriber.on_message(message.topic, message.payload)
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(host, port)
+    client.loop_start()
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="live efficiency and fuel figures from RVG_mqtt telemetry")
+    parser.add_argument("--host", default=None, help="mqtt broker, replays the csv files through a local broker if omitted")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--root", default="data/gunnerus/", help="csv files to replay")
+    parser.add_argument("--speed", type=float, default=60.0, help="replay speed, 0 replays as fast as possible")
+    parser.add_argument("--max-latency", type=float, default=0.2, help="seconds a message may wait in a batch")
+    args = parser.parse_args()
+
+    sources = [file_path.relative_to(args.root).with_suffix("").as_posix()
+               for file_path in sorted(Path(args.root).glob("RVG_mqtt/**/*.csv"))]
+    metrics = LiveMetrics(sources)
+    latencies = []
+
+    def on_batch(batches):
+        started = time.monotonic()
+        metrics.update(batches)
+        latencies.append(time.monotonic() - started)
+        print(metrics.summary(), flush=True)
+
+    subscriber = Subscriber(on_batch, max_latency=args.max_latency)
+    subscriber.start()
+    if args.host is not None:
+        client = connect_mqtt(subscriber, args.host, args.port)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            client.loop_stop()
+    else:
+        broker = LocalBroker()
+        subscriber.subscribe(broker)
+        ReplayPublisher(broker, args.root, args.speed or None).run()
+    subscriber.stop()
+    if latencies:
+        print(f"{len(latencies)} batches, slowest update {round(max(latencies) * 1000, 1)} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import basemap
+
+EXTENT = (10.33, 10.43, 63.43, 63.47)
+PLATE_CARREE = SimpleNamespace(proj4_init="+proj=eqc +lat_ts=0 +lat_0=0 +lon_0=0 +x_0=0 +y_0=0 +ellps=WGS84 +units=m")
+
+
+def test_key_changes_with_everything_drawn(monkeypatch):
+    key = basemap._key(EXTENT, PLATE_CARREE, 300, 12)
+    assert key == basemap._key(list(EXTENT), PLATE_CARREE, 300, 12)
+    # below the rounding of the extent
+    assert key == basemap._key((10.33 + 1e-9, 10.43, 63.43, 63.47), PLATE_CARREE, 300, 12)
+    assert key != basemap._key((10.33, 10.44, 63.43, 63.47), PLATE_CARREE, 300, 12)
+    assert key != basemap._key(EXTENT, SimpleNamespace(proj4_init="+proj=merc +ellps=WGS84"), 300, 12)
+    assert key != basemap._key(EXTENT, PLATE_CARREE, 150, 12)
+    assert key != basemap._key(EXTENT, PLATE_CARREE, 300, 8)
+    monkeypatch.setattr(basemap, "FEATURES", basemap.FEATURES + (("BORDERS", {"edgecolor": "red"}),))
+    assert key != basemap._key(EXTENT, PLATE_CARREE, 300, 12)
+
+
+def test_cached_render_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(basemap, "CACHE_DIRECTORY", tmp_path)
+    monkeypatch.setattr(basemap, "_images", {})
+    calls = []
+
+    def draw():
+        calls.append(1)
+        figure = plt.figure(figsize=(2, 1))
+        figure.patch.set_facecolor("lightblue")
+        return figure
+
+    key = basemap._key(EXTENT, PLATE_CARREE, 50, 2)
+    file_path = basemap.cached_render(key, draw, dpi=50)
+    assert basemap.cached_render(key, draw, dpi=50) == file_path
+    assert len(calls) == 1
+    assert [path.name for path in tmp_path.iterdir()] == [f"{key}.png"]
+
+    pixels = basemap.image(file_path)
+    assert pixels.shape[:2] == (50, 100)
+    assert basemap.image(file_path) is pixels
@@ -0,0 +1,77 @@
+from datetime import timedelta
+import numpy as np
+from follow import LiveMetrics, Monitor
+
+PORT = "RVG_mqtt/hcx_port_mp/LoadFeedback"
+STARBOARD = "RVG_mqtt/hcx_stbd_mp/LoadFeedback"
+FUEL = "RVG_mqtt/Engine1/fuel_consumption"
+LOAD = "RVG_mqtt/Engine1/engine_load"
+
+
+def samples(start: float, end: float, step: float, value: float):
+    seconds = np.arange(start, end, step)
+    time_stamps = np.datetime64("2024-09-10T06:00:00", "ns") + (seconds * 1e9).astype("timedelta64[ns]")
+    return time_stamps, value + seconds, "%"
+
+
+def test_inputs_growing_at_different_rates_stay_in_time_order():
+    # the port thruster runs ten seconds ahead of starboard in every poll
+    polls = [
+        {PORT: samples(0, 10, 0.5, 10), STARBOARD: samples(0.5, 1, 1, 20),
+         FUEL: samples(0, 10, 1, 30), LOAD: samples(0, 2, 1, 100)},
+        {STARBOARD: samples(1, 6, 1, 20), LOAD: samples(2, 12, 1, 100)},
+        {PORT: samples(10, 20, 0.5, 10), STARBOARD: samples(6, 20, 1, 20), FUEL: samples(10, 20, 1, 30)},
+    ]
+    live = LiveMetrics([PORT, STARBOARD, FUEL, LOAD])
+    for batches in polls:
+        live.update(batches)
+
+    everything = LiveMetrics([PORT, STARBOARD, FUEL, LOAD])
+    everything.update({source: tuple(np.concatenate([batches[source][column] for batches in polls if source in batches])
+                                     for column in range(2)) + ("%",)
+                       for source in (PORT, STARBOARD, FUEL, LOAD)})
+
+    for name in ("thrusters_power", "fuel_consumption"):
+        series, reference = getattr(live, name), getattr(everything, name)
+        assert np.all(np.diff(series.time_stamps) >= np.timedelta64(0, "ns"))
+        np.testing.assert_array_equal(series.time_stamps, reference.time_stamps)
+        np.testing.assert_allclose(series.values, reference.values)
+    efficiency = live.thermal_efficiency("Engine1")
+    assert np.all(np.diff(efficiency.time_stamps) >= np.timedelta64(0, "ns"))
+    np.testing.assert_allclose(efficiency.values, everything.thermal_efficiency("Engine1").values)
+    # starboard has reported up to 19 s, later port samples wait for it
+    assert live.thrusters_power.time_stamps[-1] == np.datetime64("2024-09-10T06:00:19", "ns")
+
+
+def append_csv(file_path, time_stamps, values, unit):
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(file_path, "a") as file:
+        file.writelines(f"{time_stamp}Z,{value},{unit}\n" for time_stamp, value in zip(time_stamps, values))
+
+
+def test_monitor_with_horizon_follows_files_growing_at_different_rates(tmp_path):
+    # ring buffers reject samples out of time order, so this used to stop the monitor on the second poll
+    directory = tmp_path / "gunnerus"
+    port, starboard = directory / f"{PORT}.csv", directory / f"{STARBOARD}.csv"
+    fuel, load = directory / f"{FUEL}.csv", directory / f"{LOAD}.csv"
+    append_csv(port, *samples(0, 10, 0.5, 10))
+    append_csv(starboard, *samples(0.5, 1, 1, 20))
+    append_csv(fuel, *samples(0, 10, 1, 30))
+    append_csv(load, *samples(0, 2, 1, 100))
+    monitor = Monitor(directory, horizon=timedelta(seconds=8))
+    monitor.poll()
+
+    append_csv(starboard, *samples(1, 6, 1, 20))
+    append_csv(load, *samples(2, 12, 1, 100))
+    monitor.poll()
+    append_csv(port, *samples(10, 30, 0.5, 10))
+    append_csv(starboard, *samples(6, 30, 1, 20))
+    append_csv(fuel, *samples(10, 30, 1, 30))
+    append_csv(load, *samples(12, 30, 1, 100))
+    monitor.poll()
+
+    for series in (monitor.thrusters_power, monitor.fuel_consumption, monitor.thermal_efficiency("Engine1")):
+        assert np.all(np.diff(series.time_stamps) >= np.timedelta64(0, "ns"))
+        # only the horizon is kept
+        assert series.time_stamps[-1] - series.time_stamps[0] <= np.timedelta64(8, "s")
+    assert monitor.thrusters_power.time_stamps[-1] == np.datetime64("2024-09-10T06:00:29", "ns")
@@ -0,0 +1,96 @@
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import pytest
+import kystdatahuset
+from kystdatahuset import Client
+
+
+class StandIn(BaseHTTPRequestHandler):
+    # the login and positions endpoints of Kystdatahuset, state lives on the server
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def answer(self, status: int, body) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server.connections.add(self.client_address)
+        if self.path == "/ws/" + kystdatahuset.LOGIN_PATH:
+            server.logins += 1
+            server.token = f"token{server.logins}"
+            return self.answer(200, {"data": {"JWT": server.token}})
+        if self.headers.get("Authorization") != f"Bearer {server.token}":
+            return self.answer(401, {"message": "expired"})
+        server.requests.append(body)
+        self.answer(200, {"data": [{"mmsi": body["mmsiIds"][0], "date_time_utc": body["start"], "latitude": 63.4}]})
+        if server.drop_connections:
+            # an idle keep alive connection closed by the server without telling the client
+            self.close_connection = True
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    server.logins, server.token, server.requests, server.connections = 0, None, [], set()
+    server.drop_connections = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client(server, tmp_path, **kwargs) -> Client:
+    return Client("user", "secret", f"http://127.0.0.1:{server.server_address[1]}/ws/",
+                  cache_directory=tmp_path / "cache", **kwargs)
+
+
+START = datetime(2024, 9, 10, tzinfo=timezone.utc)
+END = datetime(2024, 9, 13, tzinfo=timezone.utc)
+
+
+def test_login_once_and_reuse_one_connection(server, tmp_path):
+    with client(server, tmp_path, max_workers=1) as kystdatahuset_client:
+        records = kystdatahuset_client.fetch_positions([258342000], START, END)
+    assert [record["date_time_utc"] for record in records] == ["202409100000", "202409110000", "202409120000"]
+    assert server.logins == 1
+    # login and the three pages went over the same keep alive connection
+    assert len(server.connections) == 1
+
+
+def test_expired_token_is_renewed(server, tmp_path):
+    with client(server, tmp_path, max_workers=1) as kystdatahuset_client:
+        kystdatahuset_client.positions(258342000, START, END)
+        server.token = "revoked"
+        assert kystdatahuset_client.positions(257012170, START, END)[0]["mmsi"] == 257012170
+    assert server.logins == 2
+
+
+def test_closed_keep_alive_connection_is_retried(server, tmp_path):
+    server.drop_connections = True
+    with client(server, tmp_path, max_workers=1) as kystdatahuset_client:
+        records = kystdatahuset_client.fetch_positions([258342000], START, END)
+    assert len(records) == 3
+    assert len(server.requests) == 3
+    assert len(server.connections) > 1
+
+
+def test_answers_are_cached(server, tmp_path):
+    with client(server, tmp_path) as kystdatahuset_client:
+        first = kystdatahuset_client.fetch_positions([258342000, 257012170], START, END)
+    with client(server, tmp_path) as kystdatahuset_client:
+        second = kystdatahuset_client.fetch_positions([258342000, 257012170], START, END)
+    assert first == second
+    assert len(server.requests) == 6
+    assert server.logins == 1
@@ -0,0 +1,26 @@
+import pytest
+from dataset import Dataset
+import lazy
+
+LINES = "2024-09-10T12:00:00Z,10,%\n2024-09-10T12:00:01Z,20,%\n"
+
+
+def test_expression_must_implement_with_children():
+    with pytest.raises(TypeError):
+        lazy.Expression()
+
+
+def test_unit_is_known_before_loading(tmp_path):
+    (tmp_path / "load.csv").write_text(LINES)
+    (tmp_path / "power.csv").write_text(LINES.replace("%", "W"))
+    dataset = Dataset(tmp_path.glob("*.csv"), lambda file_path: file_path.stem)
+    [load] = dataset.lazy(lambda file_path: file_path.stem == "load")
+    [power] = dataset.lazy(lambda file_path: file_path.stem == "power")
+    assert load.unit == "%" and power.unit == "W"
+    assert not dataset._signals
+
+    with pytest.raises(ValueError):
+        load + power
+    ts = (load + load).filter_date(None, None).evaluate()
+    assert ts.unit == "%" and list(ts.values) == [20, 40]
+    assert load.unit == "%"
@@ -0,0 +1,20 @@
+import numpy as np
+from store import Store
+
+LINES = "2024-09-10T23:59:59.5Z,1.5,l/h\n2024-09-11T00:00:00.5Z,2.5,l/h\n"
+
+
+def test_empty_csv_is_skipped(tmp_path):
+    directory = tmp_path / "RVG_mqtt"
+    (directory / "Engine1").mkdir(parents=True)
+    (directory / "Engine1" / "fuel_consumption.csv").write_text("")
+    (directory / "Engine3").mkdir()
+    (directory / "Engine3" / "fuel_consumption.csv").write_text(LINES)
+
+    store = Store(tmp_path / "store")
+    assert store.ingest_directory("gunnerus", directory) == 2
+    assert store.signals("gunnerus") == [("gunnerus", "Engine3", "fuel_consumption")]
+    ts = store.query("gunnerus", "Engine3", "fuel_consumption")
+    np.testing.assert_array_equal(ts.values, [1.5, 2.5])
+    assert [entry["day"] for entry in store.partitions("gunnerus", "Engine3", "fuel_consumption")] == \
+        ["2024-09-10", "2024-09-11"]
@@ -0,0 +1,54 @@
+import numpy as np
+from follow import LiveMetrics
+from telemetry import LocalBroker, ReplayPublisher, Subscriber, topic_matches
+
+PORT = "RVG_mqtt/hcx_port_mp/LoadFeedback"
+STARBOARD = "RVG_mqtt/hcx_stbd_mp/LoadFeedback"
+
+
+def payloads(start: int, end: int, value: float) -> list[bytes]:
+    return [f"2024-09-10T06:00:{second:02d}.5Z,{value + second},%".encode() for second in range(start, end)]
+
+
+def test_topic_matches():
+    assert topic_matches("RVG_mqtt/Engine1/#", "RVG_mqtt/Engine1/fuel_consumption")
+    assert topic_matches("RVG_mqtt/+/LoadFeedback", PORT)
+    assert not topic_matches("RVG_mqtt/+/LoadFeedback", "RVG_mqtt/Engine1/engine_load")
+    assert not topic_matches("RVG_mqtt/hcx_port_mp", PORT)
+
+
+def test_topics_published_out_of_order_are_combined_in_time_order():
+    # the port thruster publishes half a minute ahead of starboard, batches cut through both
+    metrics = LiveMetrics([PORT, STARBOARD])
+    broker = LocalBroker()
+    subscriber = Subscriber(metrics.update, max_messages=7, max_latency=60)
+    subscriber.subscribe(broker)
+    for start in range(0, 60, 10):
+        for payload in payloads(start, start + 10, 10):
+            broker.publish(PORT, payload)
+        if start >= 30:
+            for payload in payloads(start - 30, start - 20, 20):
+                broker.publish(STARBOARD, payload)
+    for payload in payloads(30, 60, 20):
+        broker.publish(STARBOARD, payload)
+    subscriber.stop()
+
+    time_stamps = metrics.thrusters_power.time_stamps
+    assert np.all(np.diff(time_stamps) >= np.timedelta64(0, "ns"))
+    assert len(time_stamps) == 119
+    assert len(metrics.signals[PORT].values) == len(metrics.signals[STARBOARD].values) == 60
+
+
+def test_replay_merges_topics_in_time_order(tmp_path):
+    for topic, value in ((PORT, 10), (STARBOARD, 20)):
+        file_path = tmp_path / f"{topic}.csv"
+        file_path.parent.mkdir(parents=True)
+        lines = payloads(0, 30, value)[value // 10 - 1::2]
+        # the last line of a file may lack its newline
+        file_path.write_bytes(b"\n".join(lines))
+    published = []
+    broker = LocalBroker()
+    broker.subscribe("RVG_mqtt/#", lambda topic, payload: published.append((topic, payload)))
+    assert ReplayPublisher(broker, tmp_path, speed=None).run() == 30
+    assert [payload[17:19] for _, payload in published] == [f"{second:02d}".encode() for second in range(30)]
+    assert [topic for topic, _ in published[:3]] == [PORT, STARBOARD, PORT]
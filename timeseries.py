@@ -1,71 +1,101 @@
-from itertools import accumulate
 import matplotlib.pyplot as plt
 import numpy as np
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Self
-import warnings
+import ingest
+import cache
+import frame
+import downsample
+import lazy
+import transform
+import instrument
+
+RESAMPLE_METHODS = ("mean", "min", "max", "last", "linear", "integral")
+
+INTEGRATION_METHODS = ("trapezoid", "left")
+TIME_UNITS_IN_SECONDS = {"s": 1, "min": 60, "h": 3600}
+INTEGRATED_UNITS = {"W": "J", "kW": "kJ", "kilowatt": "kJ"}
+
+EARLIEST = np.datetime64(np.iinfo(np.int64).min + 1, 'ns')
+LATEST = np.datetime64(np.iinfo(np.int64).max, 'ns')
+
+
+def to_datetime64(date_time: datetime | None, default: np.datetime64 = None) -> np.datetime64:
+    if date_time is None:
+        return default
+    # routes are timezone aware while the signals are stored as naive utc
+    if isinstance(date_time, datetime) and date_time.tzinfo is not None:
+        date_time = date_time.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(date_time, 'ns')
+
+
+def integrated_unit(unit: str | None) -> tuple[str, float]:
+    # unit of the time integral and the factor that converts value·seconds into it
+    if unit in INTEGRATED_UNITS:
+        return INTEGRATED_UNITS[unit], 1.0
+    if unit is not None and "/" in unit:
+        quantity, time_unit = unit.rsplit("/", 1)
+        if time_unit in TIME_UNITS_IN_SECONDS:
+            return quantity, 1.0 / TIME_UNITS_IN_SECONDS[time_unit]
+    return f"{unit}·s", 1.0
 
 
 class TimeSeries:
     def __init__(self, time_stamps: list[datetime], values: list[float], label: str, unit: str):
-        self.time_stamps = np.array(time_stamps, dtype='datetime64[ns]')
-        self.values = np.array(values, dtype=float)
+        self.time_stamps = np.asarray(time_stamps, dtype='datetime64[ns]')
+        self.values = np.asarray(values, dtype=float)
         self.label = label
         self.unit = unit
 
     @classmethod
-    def from_csv(cls, file_path: str, label: str) -> Self:
-        unit = None
-        time_stamps = []
-        values = []
-        for line in open(file_path).readlines():
-            match line.split(","):
-                case [date_time_raw, value_raw, unit_raw]:
-                    if unit is None:
-                        unit = unit_raw.strip()
-                    ts = datetime.fromisoformat(date_time_raw.strip()).astimezone(timezone.utc).replace(tzinfo=None)
-                    time_stamps.append(ts)
-                    values.append(float(value_raw.strip()))
-                case _:
-                    raise ValueError("cannot deserialize line", line)
+    def from_csv(cls, file_path: str, label: str, cache_mode: str = None) -> Self:
+        with instrument.span("timeseries.load", label=label) as span:
+            time_stamps, values, unit = cache.read_csv(file_path, label, ingest.read_csv, cache_mode)
+            span.samples = len(values)
         return cls(time_stamps, values, label, unit)
 
-    def get_time_diff(self):
-        ret = []
-        for i, time_stamp in enumerate(self.time_stamps[:-1]):
-            ret.append(self.time_stamps[i+1] - self.time_stamps[i])
-        return ret
+    def diff(self) -> np.ndarray:
+        # nanoseconds between consecutive samples as int64
+        return np.diff(self.time_stamps.astype(np.int64))
 
-        # return [time_stamp[i+1] - time_stamp[i] for i, time_stamp in enumerate(self.time_stamps[:-1])]
+    def get_time_diff(self) -> np.ndarray:
+        return self.diff().astype('timedelta64[ns]')
 
     def interpolate(self, other: Self) -> None:
-        all_times = np.unique(np.concatenate((self.time_stamps, other.time_stamps)))
-        interpolated_self_values = np.interp(all_times.astype('datetime64[s]').astype(np.float64),
-                                             self.time_stamps.astype('datetime64[s]').astype(np.float64),
-                                             self.values)
-        interpolated_other_values = np.interp(all_times.astype('datetime64[s]').astype(np.float64),
-                                              other.time_stamps.astype('datetime64[s]').astype(np.float64),
-                                              other.values)
-        self.time_stamps = all_times
-        self.values = interpolated_self_values
-        other.time_stamps = all_times
-        other.values = interpolated_other_values
+        # aligns both series in place on the union of their time stamps, use frame.align to keep the inputs
+        with instrument.span("timeseries.align", label=self.label) as span:
+            aligned_self, aligned_other = frame.align([self, other]).series()
+            span.samples = len(aligned_self.values)
+        self.time_stamps, self.values = aligned_self.time_stamps, aligned_self.values
+        other.time_stamps, other.values = aligned_other.time_stamps, aligned_other.values
+
+    def lazy(self) -> "lazy.Expression":
+        # opt in to deferred arithmetic, see lazy.py
+        return lazy.Leaf(self)
 
     def __add__(self, other: Self) -> Self:
         if self.label is None:
             raise ValueError("current instance is missing a label")
+        if isinstance(other, lazy.Expression):
+            return NotImplemented
         if self.unit != other.unit:
             raise ValueError(f"Cannot add TimeSeries with different units: {self.unit} and {other.unit}")
-        self.interpolate(other)
-        return TimeSeries(self.time_stamps, self.values + other.values, self.label, self.unit)
+        with instrument.span("timeseries.align", label=self.label) as span:
+            aligned = frame.align([self, other])
+            span.samples = len(aligned.time_stamps)
+        return TimeSeries(aligned.time_stamps, aligned.columns[0] + aligned.columns[1], self.label, self.unit)
 
     def __sub__(self, other: Self) -> Self:
         if self.label is None:
             raise ValueError("current instance is missing a label")
+        if isinstance(other, lazy.Expression):
+            return NotImplemented
         if self.unit != other.unit:
             raise ValueError(f"Cannot subtract TimeSeries with different units: {self.unit} and {other.unit}")
-        self.interpolate(other)
-        return TimeSeries(self.time_stamps, self.values - other.values, self.label, self.unit)
+        with instrument.span("timeseries.align", label=self.label) as span:
+            aligned = frame.align([self, other])
+            span.samples = len(aligned.time_stamps)
+        return TimeSeries(aligned.time_stamps, aligned.columns[0] - aligned.columns[1], self.label, self.unit)
 
     def __mul__(self, other: int) -> Self:
         if self.label is None:
@@ -89,15 +119,18 @@ class TimeSeries:
         return zip(self.time_stamps, self.values)
 
     def transform(self, transformer, new_unit: str, other: Self = None) -> Self:
-        transformed_values = []
-        if other is None:
-            transformed_values = [transformer(value) for value in self.values]
-        else:
-            self.interpolate(other)
-            transformed_values = [transformer(value, other) for value in self.values]
-        return TimeSeries(self.time_stamps, transformed_values, self.label, new_unit)
-
-    def plot(self, ax: plt.Axes, title, route, label: str = None) -> None:
+        # with other the transformer is binary and gets both series aligned on their union time stamps
+        with instrument.span("timeseries.transform", label=self.label, unit=new_unit) as span:
+            if other is None:
+                span.samples = len(self.values)
+                return TimeSeries(self.time_stamps, transform.apply(transformer, self.values), self.label, new_unit)
+            aligned = frame.align([self, other])
+            values = transform.apply(transformer, aligned.columns[0], aligned.columns[1])
+            span.samples = len(values)
+            return TimeSeries(aligned.time_stamps, values, self.label, new_unit)
+
+    def plot(self, ax: plt.Axes, title, route, label: str = None, downsample_method: str | None = "min_max") -> None:
+        # long series are reduced to what the axes can show, downsample_method=None draws every sample
         if self.unit not in ["%", "kW", "kg"]:
             ax.ticklabel_format(axis='y', style='sci', scilimits=(1, 0))
         ax.tick_params(axis='x', rotation=45)
@@ -107,27 +140,95 @@ class TimeSeries:
         ax.set_title(title + " route: " + route[0])
         ax.grid(True)
         label = label or self.label
-        ax.plot(self.time_stamps, self.values, label=label)
+        with instrument.span("timeseries.plot", label=label) as span:
+            indices = None if downsample_method is None else downsample.series_indices(
+                ax, self.time_stamps, self.values, downsample_method)
+            if indices is None:
+                ax.plot(self.time_stamps, self.values, label=label)
+            else:
+                ax.plot(self.time_stamps[indices], self.values[indices], label=label)
+            span.samples = len(self.values) if indices is None else len(indices)
         ax.legend()
 
     def filter_date(self, date_time_start: datetime, date_time_end: datetime) -> Self:
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=UserWarning)
-            filtered_data = [(time, value) for (time, value) in self
-                             if np.datetime64(date_time_start) <= time <= np.datetime64(date_time_end)]
-
-        if not filtered_data:
-            return TimeSeries([], [], self.label, self.unit)
-
-        filtered_timestamps, filtered_values = zip(*filtered_data)
-        return TimeSeries(list(filtered_timestamps), list(filtered_values), self.label, self.unit)
-
-    def integrate(self, from_num_sample=None, to_num_sample=None) -> int:
-        sample_time = self.get_sample_time()
-        acc = 0
-        for value in self.values[from_num_sample:to_num_sample]:
-            acc += value * sample_time
-        return acc
+        return self.filter_dates([(date_time_start, date_time_end)])[0]
+
+    def filter_dates(self, windows: list[tuple[datetime, datetime]]) -> list[Self]:
+        # time stamps are sorted, so every window is a slice that shares memory with this series
+        with instrument.span("timeseries.window", label=self.label, windows=len(windows)) as span:
+            starts = np.array([to_datetime64(start, EARLIEST) for start, _ in windows], dtype='datetime64[ns]')
+            ends = np.array([to_datetime64(end, LATEST) for _, end in windows], dtype='datetime64[ns]')
+            lefts = np.searchsorted(self.time_stamps, starts, side="left")
+            rights = np.searchsorted(self.time_stamps, ends, side="right")
+            span.samples = int((rights - lefts).sum())
+        return [TimeSeries(self.time_stamps[left:right], self.values[left:right], self.label, self.unit)
+                for left, right in zip(lefts, rights)]
+
+    def resample(self, period: timedelta | np.timedelta64, method: str = "mean") -> Self:
+        # bins are aligned to the epoch so series resampled with the same period share their grid.
+        # integral converts rates like the other integrals do, e.g. l/h -> l per bin
+        if method not in RESAMPLE_METHODS:
+            raise ValueError(f"unknown resample method {method}, expected one of {RESAMPLE_METHODS}")
+        period_ns = np.timedelta64(period, 'ns').astype(np.int64)
+        if period_ns <= 0:
+            raise ValueError(f"resample period must be positive, got {period}")
+        unit, factor = integrated_unit(self.unit) if method == "integral" else (self.unit, 1.0)
+        if len(self.time_stamps) == 0:
+            return TimeSeries(self.time_stamps, self.values, self.label, unit)
+
+        time_stamps_ns = self.time_stamps.astype(np.int64)
+        first_bin = time_stamps_ns[0] // period_ns
+        bins = time_stamps_ns // period_ns - first_bin
+        number_of_bins = bins[-1] + 1
+        grid = ((first_bin + np.arange(number_of_bins)) * period_ns).astype('datetime64[ns]')
+
+        if method == "linear":
+            return frame.align([self], grid)[0]
+
+        if method == "integral":
+            # cumulative trapezoid evaluated at the bin edges keeps the total integral exact
+            seconds = (time_stamps_ns - time_stamps_ns[0]) * 1e-9
+            cumulative = np.concatenate(([0.0], np.cumsum(np.diff(seconds) * (self.values[1:] + self.values[:-1]) / 2)))
+            edges = ((first_bin + np.arange(number_of_bins + 1)) * period_ns - time_stamps_ns[0]) * 1e-9
+            values = np.diff(np.interp(edges, seconds, cumulative)) * factor
+            return TimeSeries(grid, values, self.label, unit)
+
+        starts = np.flatnonzero(np.diff(bins, prepend=-1))
+        values = np.full(number_of_bins, np.nan)
+        match method:
+            case "mean":
+                sums = np.add.reduceat(self.values, starts)
+                values[bins[starts]] = sums / np.diff(starts, append=len(bins))
+            case "min":
+                values[bins[starts]] = np.minimum.reduceat(self.values, starts)
+            case "max":
+                values[bins[starts]] = np.maximum.reduceat(self.values, starts)
+            case "last":
+                values[bins[starts]] = self.values[np.append(starts[1:], len(bins)) - 1]
+        return TimeSeries(grid, values, self.label, unit)
+
+    def _integral_increments(self, method: str) -> np.ndarray:
+        seconds = self.diff() * 1e-9
+        match method:
+            case "trapezoid":
+                return seconds * (self.values[1:] + self.values[:-1]) / 2
+            case "left":
+                return seconds * self.values[:-1]
+            case _:
+                raise ValueError(f"unknown integration method {method}, expected one of {INTEGRATION_METHODS}")
+
+    def integrate(self, method: str = "trapezoid", scale: float = 1.0) -> float:
+        _, factor = integrated_unit(self.unit)
+        return float(self._integral_increments(method).sum() * factor * scale)
+
+    def cumulative_integral(self, new_unit: str = None, method: str = "trapezoid", scale: float = 1.0) -> Self:
+        # rates per hour/minute/second are integrated to their quantity, e.g. l/h -> l, kg/s -> kg and W -> J.
+        # scale converts the result further, e.g. scale=0.82 together with new_unit="kg" for l/h of diesel
+        unit, factor = integrated_unit(self.unit)
+        if len(self.values) == 0:
+            return TimeSeries(self.time_stamps, np.array([], dtype=float), self.label, new_unit or unit)
+        values = np.concatenate(([0.0], np.cumsum(self._integral_increments(method)))) * (factor * scale)
+        return TimeSeries(self.time_stamps, values, self.label, new_unit or unit)
 
     def to_cumulative_values(self):
-        return list(accumulate(self.values))
+        return np.cumsum(self.values)
@@ -1,10 +1,36 @@
+import numpy as np
+
 DENCITY_DIESEL = 820
 
 
+def apply(transformer, *values):
+    # every transformer here is plain arithmetic, so it runs on whole arrays at once.
+    # transformers that branch on their input fall back to element wise evaluation
+    arrays = [np.asarray(value, dtype=float) for value in values]
+    try:
+        result = np.asarray(transformer(*arrays), dtype=float)
+    except (TypeError, ValueError):
+        return np.vectorize(transformer, otypes=[float])(*arrays)
+    if result.shape != arrays[0].shape:
+        # transformers returning a constant
+        result = np.full(arrays[0].shape, result)
+    return result
+
+
+def chain(*transformers):
+    # fuses several transformers into one so intermediate series never get allocated
+    def chained(*values):
+        value = transformers[0](*values)
+        for transformer in transformers[1:]:
+            value = transformer(value)
+        return value
+    return chained
+
+
 def transform_value(time_series, transformer):
     new_time_series = {}
     for label, (time, values) in time_series.items():
-        new_time_series[label] = (time, [transformer(value) for value in values])
+        new_time_series[label] = (time, apply(transformer, values))
 
     return new_time_series
 
@@ -43,6 +69,11 @@ def engine_load(engine_load_kw):
     return engine_load_kw * 1e3
 
 
+def thruster_power_to_engine_power(thruster_power, efficiency_switchboard=0.99, efficiency_frequency_converter=0.97,
+                                   efficiency_generator=0.96):
+    return thruster_power / (efficiency_frequency_converter * efficiency_switchboard * efficiency_generator)
+
+
 def engine_power_to_total_load(engine_load_kw):
     number_of_engines = 2
     max_power_engine = 450e3
@@ -83,6 +114,11 @@ def engine_thermal_efficiency(value):
     return value * ((36e3) / (820 * 454) * to_percent)
 
 
+# engine load in kW and fuel flow rate in liters per hour
+def engine_thermal_efficiency_from_fuel_flow(engine_load_kw, fuel_flow):
+    return engine_thermal_efficiency(engine_load_kw / fuel_flow)
+
+
 def bmep(power_diesel_engine):
     displaced_volume = 0.001
     number_of_cylinders = 8